@@ -4,24 +4,26 @@ import math
 import re
 from collections import Counter, defaultdict
 from itertools import product
-from pathlib import Path
 from typing import Iterable, Tuple
 
+import numpy as np
+
+import glyphs as gl
 from clean import clean_word
 from word_stats import currier_page_filter
 
 log = logging.getLogger(__name__)
 
 
-def _filter_pages(pages, currier="all"):
-    keep = currier_page_filter(currier, ordered_pages=list(pages.keys()))
+def _filter_pages(pages, currier="all", currier_map=None):
+    keep = currier_page_filter(currier, ordered_pages=list(pages.keys()), currier_map=currier_map)
     if not keep:
         return pages
     return {pid: pdata for pid, pdata in pages.items() if pid in keep}
 
 
-def _iter_paragraph_tokens(pages, currier="all", cleaned=False):
-    for pid, pdata in _filter_pages(pages, currier).items():
+def _iter_paragraph_tokens(pages, currier="all", cleaned=False, currier_map=None):
+    for pid, pdata in _filter_pages(pages, currier, currier_map).items():
         for p_idx, paragraph in enumerate(pdata["paragraphs"]):
             para_tokens = []
             for line_idx, line in enumerate(paragraph):
@@ -67,21 +69,34 @@ def _build_deletion_lexicon(vocab: Iterable[str]) -> Tuple[defaultdict, defaultd
     return del1, del2
 
 
-def build_models(pages, currier="all", cleaned=False, core_quantile=0.9):
+def build_models(pages, currier="all", cleaned=False, core_quantile=0.9, glyphs=None, currier_map=None):
     word_counts = Counter()
     word_bigrams = Counter()
     char_counts = {2: Counter(), 3: Counter()}
     char_vocab = Counter()
+    inventory = gl.as_inventory(glyphs)
 
-    for _, _, tokens in _iter_paragraph_tokens(pages, currier=currier, cleaned=cleaned):
+    for _, _, tokens in _iter_paragraph_tokens(pages, currier=currier, cleaned=cleaned, currier_map=currier_map):
         word_counts.update(tokens)
         word_bigrams.update(zip(tokens, tokens[1:]))
+        if inventory:
+            continue  # glyph n-grams are counted below in one vectorized pass
         for w in tokens:
             char_vocab.update(w)
             for n in (2, 3):
                 for i in range(len(w) - n + 1):
                     char_counts[n][w[i : i + n]] += 1
 
+    glyph_model = None
+    if inventory:
+        # glyph units: count the integer glyph codes of every token once (glyphs.py), keep the keys for _char_probs
+        coded = gl.encode_words(word_counts.elements(), inventory)
+        base = len(coded["glyph_vocab"]) + 1
+        char_vocab = Counter({g[0]: c for g, c in gl.glyph_ngram_counts(coded, 1).items()})
+        char_counts = {n: gl.glyph_ngram_counts(coded, n) for n in (2, 3)}
+        keys = {n: np.unique(gl.glyph_ngram_keys(coded, n, base=base)[1], return_counts=True) for n in (2, 3)}
+        glyph_model = {"glyph_vocab": coded["glyph_vocab"], "keys": keys}
+
     core = _core_vocab(word_counts, quantile=core_quantile)
     del1, del2 = _build_deletion_lexicon(core)
     top_chars = [c for c, _ in char_vocab.most_common(6)]
@@ -99,11 +114,13 @@ def build_models(pages, currier="all", cleaned=False, core_quantile=0.9):
         "core_vocab": set(core),
         "del1": del1,
         "del2": del2,
+        "glyphs": inventory,
+        "glyph_model": glyph_model,
     }
 
 
-def find_ambiguous_tokens(pages, currier="all"):
-    keep = currier_page_filter(currier, ordered_pages=list(pages.keys()))
+def find_ambiguous_tokens(pages, currier="all", currier_map=None):
+    keep = currier_page_filter(currier, ordered_pages=list(pages.keys()), currier_map=currier_map)
     results = []
     for pid, pdata in pages.items():
         if keep and pid not in keep:
@@ -155,6 +172,28 @@ def _char_prob(word: str, models, k=0.1):
     return sum(parts) / len(parts)
 
 
+def _char_probs(words, models, k=0.1):
+    # _char_prob for a batch of words on a glyph model: n-gram keys looked up in the training keys, no per-gram loop
+    glyph_model = models["glyph_model"]
+    coded = gl.recode(gl.encode_words(words, models["glyphs"]), glyph_model["glyph_vocab"])
+    base = len(glyph_model["glyph_vocab"]) + 1
+    part_sum, part_n = np.zeros(len(words)), np.zeros(len(words))
+    for n in (2, 3):
+        total = models["char_totals"][n] + k * max(len(models["char_vocab"]), 1)
+        if total == 0:
+            continue
+        rows, keys = gl.glyph_ngram_keys(coded, n, base=base)
+        seen, counts = glyph_model["keys"][n]
+        idx = np.minimum(np.searchsorted(seen, keys), max(len(seen) - 1, 0))
+        c = np.where(seen[idx] == keys, counts[idx], 0) if len(seen) else np.zeros(len(keys))
+        grams = np.bincount(rows, minlength=len(words))
+        probs = np.bincount(rows, weights=(c + k) / total, minlength=len(words))
+        has = grams > 0
+        part_sum[has] += probs[has] / grams[has]
+        part_n += has
+    return np.where(part_n > 0, part_sum / np.maximum(part_n, 1), 0.0).tolist()
+
+
 def _context_log_prob(candidate, prev_tok, next_tok, models, k=0.1):
     if not prev_tok and not next_tok:
         return 0.0
@@ -171,11 +210,11 @@ def _context_log_prob(candidate, prev_tok, next_tok, models, k=0.1):
     return score
 
 
-def _combined_score(candidate, models, prev_tok=None, next_tok=None, weights=(1.0, 0.4, 0.2)):
+def _combined_score(candidate, models, prev_tok=None, next_tok=None, weights=(1.0, 0.4, 0.2), char_score=None):
     wc = models["word_counts"]
     max_freq = wc.most_common(1)[0][1] if wc else 1
     word_prior = wc.get(candidate, 0) / max_freq
-    char_score = _char_prob(candidate, models)
+    char_score = _char_prob(candidate, models) if char_score is None else char_score
     ctx_score = _context_log_prob(candidate, prev_tok, next_tok, models)
     a, b, c = weights
     return a * word_prior + b * char_score + c * ctx_score, {
@@ -227,8 +266,10 @@ def propose_candidates(token_info, models, weights=(1.0, 0.4, 0.2)):
     prev_tok = token_info.get("prev")
     next_tok = token_info.get("next")
     candidates = []
-    for cand in _candidate_variants(token, models):
-        score, parts = _combined_score(cand, models, prev_tok=prev_tok, next_tok=next_tok, weights=weights)
+    variants = list(_candidate_variants(token, models))
+    char_scores = _char_probs(variants, models) if models.get("glyph_model") else [None] * len(variants)
+    for cand, char_score in zip(variants, char_scores):
+        score, parts = _combined_score(cand, models, prev_tok=prev_tok, next_tok=next_tok, weights=weights, char_score=char_score)
         freq = models["word_counts"].get(cand, 0)
         candidates.append({"form": cand, "score": score, "freq": freq, **parts})
     candidates.sort(key=lambda x: x["score"], reverse=True)
@@ -248,9 +289,9 @@ def propose_candidates(token_info, models, weights=(1.0, 0.4, 0.2)):
     return candidates
 
 
-def analyze_ambiguous(pages, currier="all", cleaned=False, weights=(1.0, 0.4, 0.2), freq_min=3):
-    models = build_models(pages, currier=currier, cleaned=cleaned)
-    targets = find_ambiguous_tokens(pages, currier=currier)
+def analyze_ambiguous(pages, currier="all", cleaned=False, weights=(1.0, 0.4, 0.2), freq_min=3, glyphs=None, currier_map=None):
+    models = build_models(pages, currier=currier, cleaned=cleaned, glyphs=glyphs, currier_map=currier_map)
+    targets = find_ambiguous_tokens(pages, currier=currier, currier_map=currier_map)
     results = []
     for t in targets:
         cands = propose_candidates(t, models, weights=weights)
@@ -276,9 +317,8 @@ def mapping_from_results(results, prob_thresh=0.5, gap_thresh=1.5):
 
 
 if __name__ == "__main__":
-    from load_voynich_transcription import pages
+    from pipeline import run
 
-    results_a = analyze_ambiguous(pages, currier="a", cleaned=False, freq_min=3)
-    results_b = analyze_ambiguous(pages, currier="b", cleaned=False, freq_min=3)
-    write_results(Path("data/ambiguous_a.json"), results_a)
-    write_results(Path("data/ambiguous_b.json"), results_b)
\ No newline at end of file
+    # resolver_a / resolver_b run concurrently and write data/ambiguous_a.json, data/ambiguous_b.json
+    logging.basicConfig(level=logging.INFO)
+    run(["resolver_a", "resolver_b"])
\ No newline at end of file
@@ -0,0 +1,126 @@
+"""
+Positional inverted index and keyword-in-context (KWIC) queries over the compiled corpus (`corpus.py`).
+- index: CSR postings; the positions of term id t are index["postings"][index["offsets"][t]:index["offsets"][t + 1]],
+  sorted global token positions into the corpus stream (page/paragraph/line/offset columns are gathered from there)
+- patterns: fnmatch-style on the EVA string, `*` = any run, `?` = any single EVA character (not a glyph: "?edy" does not match
+  "chedy"), `[?]` = a literal `?`; pass wildcards=False for exact lookup
+- filters: page ids via pages=..., $-header keys or aliases via keyword (currier="A", illustration="H", hand="2", ...)
+"""
+import fnmatch
+import re
+
+import numpy as np
+
+from corpus import token_ids, token_vocab, token_mask
+
+POSITION_DTYPE = np.dtype([("page", np.int32), ("paragraph", np.int32), ("line", np.int32), ("token", np.int32)])
+_wildcard_re = re.compile(r"[*?\[]")
+
+
+def build_index(corpus, cleaned=False):
+    ids = token_ids(corpus, cleaned)
+    vocab = token_vocab(corpus, cleaned)
+    order = np.argsort(ids, kind="stable")
+    valid = order[ids[order] >= 0]
+    counts = np.bincount(ids[valid], minlength=len(vocab))
+    offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return {
+        "cleaned": cleaned,
+        "vocab": vocab,
+        "lookup": {w: i for i, w in enumerate(vocab)},
+        "postings": valid.astype(np.int64),
+        "offsets": offsets,
+        "counts": counts,
+        "patterns": {},
+    }
+
+
+def match_terms(index, pattern, wildcards=True):
+    if not wildcards or not _wildcard_re.search(pattern):
+        tid = index["lookup"].get(pattern)
+        return np.asarray([] if tid is None else [tid], dtype=np.int64)
+    cache = index["patterns"]
+    if pattern not in cache:
+        rx = re.compile(fnmatch.translate(pattern))
+        cache[pattern] = np.asarray([i for i, w in enumerate(index["vocab"]) if rx.match(w)], dtype=np.int64)
+    return cache[pattern]
+
+
+def _postings(index, term_ids):
+    offsets, postings = index["offsets"], index["postings"]
+    if len(term_ids) == 1:
+        t = term_ids[0]
+        return postings[offsets[t]:offsets[t + 1]]
+    if not len(term_ids):
+        return postings[:0]
+    return np.sort(np.concatenate([postings[offsets[t]:offsets[t + 1]] for t in term_ids]))
+
+
+def lookup(corpus, index, pattern, wildcards=True, pages=None, **filters):
+    """Sorted token positions of every occurrence of `pattern`, restricted to pages passing the filters."""
+    hits = _postings(index, match_terms(index, pattern, wildcards))
+    mask = token_mask(corpus, pages=pages, **filters)
+    return hits if mask is None else hits[mask[hits]]
+
+
+def near(corpus, index, positions, other, window=5, wildcards=True):
+    """Subset of `positions` with an occurrence of `other` within +-window tokens in the same paragraph."""
+    partners = _postings(index, match_terms(index, other, wildcards))
+    if not len(positions) or not len(partners):
+        return positions[:0]
+    para = corpus["para_idx"][positions]
+    lo = np.maximum(positions - window, corpus["para_offsets"][para])
+    hi = np.minimum(positions + window, corpus["para_offsets"][para + 1] - 1)
+    found = np.searchsorted(partners, hi, side="right") - np.searchsorted(partners, lo, side="left")
+    found -= np.isin(positions, partners)
+    return positions[found > 0]
+
+
+def positions_table(corpus, positions):
+    out = np.empty(len(positions), dtype=POSITION_DTYPE)
+    out["page"] = corpus["page_idx"][positions]
+    out["paragraph"] = corpus["para_num"][corpus["para_idx"][positions]]
+    out["line"] = corpus["line_num"][corpus["line_idx"][positions]]
+    out["token"] = corpus["tok_idx"][positions]
+    return out
+
+
+def kwic(corpus, index, positions, width=5):
+    """One row per position with left/right context clipped to the paragraph."""
+    ids = token_ids(corpus, index["cleaned"])
+    vocab = index["vocab"]
+    para = corpus["para_idx"][positions]
+    starts = np.maximum(positions - width, corpus["para_offsets"][para])
+    ends = np.minimum(positions + width + 1, corpus["para_offsets"][para + 1])
+    table = positions_table(corpus, positions)
+    line_rows = corpus["line_idx"][positions].tolist()
+    rows = []
+    for pos, s, e, line_row, rec in zip(positions.tolist(), starts.tolist(), ends.tolist(), line_rows, table):
+        rows.append(
+            {
+                "page_id": corpus["page_ids"][rec["page"]],
+                "paragraph_idx": int(rec["paragraph"]),
+                "line_id": corpus["line_ids"][line_row],
+                "token_idx": int(rec["token"]),
+                "left": [vocab[t] for t in ids[s:pos] if t >= 0],
+                "keyword": vocab[ids[pos]],
+                "right": [vocab[t] for t in ids[pos + 1:e] if t >= 0],
+            }
+        )
+    return rows
+
+
+def concordance(corpus, index, pattern, width=5, near_pattern=None, window=5, wildcards=True, limit=None, pages=None, **filters):
+    positions = lookup(corpus, index, pattern, wildcards=wildcards, pages=pages, **filters)
+    if near_pattern is not None:
+        positions = near(corpus, index, positions, near_pattern, window=window, wildcards=wildcards)
+    if limit is not None:
+        positions = positions[:limit]
+    return kwic(corpus, index, positions, width=width)
+
+
+def format_kwic(rows, width=40):
+    return "\n".join(
+        f"{r['line_id']:<10} {' '.join(r['left'])[-width:]:>{width}}  [{r['keyword']}]  {' '.join(r['right'])[:width]}" for r in rows
+    )
@@ -0,0 +1,211 @@
+"""
+Compiled token corpus: the nested `pages` structure flattened into numpy columns, built once.
+- one row per word of every line, in reading order (page -> paragraph -> line -> word)
+- raw_ids / clean_ids: int32 codes into raw_vocab / clean_vocab; clean_ids is -1 where clean_word() leaves nothing
+- page_idx, para_idx, line_idx: int32 global rows into the page / paragraph / line tables; tok_idx: offset within the line
+- para_offsets, line_offsets: CSR boundaries into the token stream (row i spans offsets[i]:offsets[i + 1])
+- para_page, para_num: page row and paragraph number within the page, per paragraph
+- line_ids, line_markers, line_para, line_num: transcription label, marker, paragraph row, line number within paragraph
+- page_ids: page row -> page id; meta_codes[key] / meta_values[key]: coded $-header columns per page row
+- glyph_vocab, glyph_codes, glyph_offsets, glyph_inventory: EVA glyph codes of every clean type (see glyphs.py)
+Files: reads data/voynich_parsed.json (written by load_voynich_transcription.py), caches data/voynich_corpus.npz together with
+a digest of the code the columns depend on (corpus.py, clean.py, glyphs.py) and the glyph inventory
+"""
+import hashlib
+import json
+import logging
+from pathlib import Path
+
+import numpy as np
+
+from clean import clean_word
+from glyphs import DEFAULT_GLYPHS, attach_glyphs
+
+log = logging.getLogger(__name__)
+
+data_dir = Path(__file__).parent / "data"
+parsed_path = data_dir / "voynich_parsed.json"
+corpus_path = data_dir / "voynich_corpus.npz"
+source_modules = ("corpus", "clean", "glyphs")
+
+META_KEYS = ("Q", "P", "F", "B", "I", "L", "H", "C", "X")
+META_ALIASES = {"quire": "Q", "panel": "P", "folio": "F", "bifolio": "B", "illustration": "I", "currier": "L", "hand": "H", "scribe": "H"}
+
+
+def load_pages(path=parsed_path):
+    return json.loads(Path(path).read_text(encoding="utf-8"))
+
+
+def _encode(values):
+    lookup = {}
+    codes = np.fromiter((lookup.setdefault(v, len(lookup)) for v in values), dtype=np.int32, count=len(values))
+    return codes, list(lookup)
+
+
+def build_corpus(pages, glyphs=DEFAULT_GLYPHS):
+    page_ids = list(pages)
+    raw_words, para_offsets, para_page, para_num = [], [0], [], []
+    line_offsets, line_ids, line_markers, line_para, line_num = [0], [], [], [], []
+    for p_row, pid in enumerate(page_ids):
+        for p_num, paragraph in enumerate(pages[pid]["paragraphs"]):
+            for l_num, line in enumerate(paragraph):
+                raw_words.extend(line["words"])
+                line_offsets.append(len(raw_words))
+                line_ids.append(line.get("id", ""))
+                line_markers.append(line.get("marker", ""))
+                line_para.append(len(para_page))
+                line_num.append(l_num)
+            para_offsets.append(len(raw_words))
+            para_page.append(p_row)
+            para_num.append(p_num)
+    line_offsets = np.asarray(line_offsets, dtype=np.int64)
+    para_offsets = np.asarray(para_offsets, dtype=np.int64)
+    line_para = np.asarray(line_para, dtype=np.int32)
+    para_page = np.asarray(para_page, dtype=np.int32)
+
+    raw_ids, raw_vocab = _encode(raw_words)
+    cleaned = [clean_word(w) for w in raw_vocab]
+    clean_vocab = sorted({w for w in cleaned if w})
+    clean_lookup = {w: i for i, w in enumerate(clean_vocab)}
+    raw_to_clean = np.asarray([clean_lookup.get(w, -1) for w in cleaned], dtype=np.int32)
+
+    line_idx = np.repeat(np.arange(len(line_ids), dtype=np.int32), np.diff(line_offsets))
+    tok_idx = (np.arange(len(raw_words), dtype=np.int64) - np.repeat(line_offsets[:-1], np.diff(line_offsets))).astype(np.int32)
+    para_idx = line_para[line_idx]
+
+    meta_codes, meta_values = {}, {}
+    for key in META_KEYS:
+        meta_codes[key], meta_values[key] = _encode([(pages[pid].get("meta") or {}).get(key, "") for pid in page_ids])
+
+    corpus = {
+        "raw_ids": raw_ids,
+        "clean_ids": raw_to_clean[raw_ids] if len(raw_ids) else raw_ids.copy(),
+        "raw_vocab": raw_vocab,
+        "clean_vocab": clean_vocab,
+        "page_idx": para_page[para_idx],
+        "para_idx": para_idx,
+        "line_idx": line_idx,
+        "tok_idx": tok_idx,
+        "para_offsets": para_offsets,
+        "para_page": para_page,
+        "para_num": np.asarray(para_num, dtype=np.int32),
+        "line_offsets": line_offsets,
+        "line_ids": line_ids,
+        "line_markers": line_markers,
+        "line_para": line_para,
+        "line_num": np.asarray(line_num, dtype=np.int32),
+        "page_ids": page_ids,
+        "meta_codes": meta_codes,
+        "meta_values": meta_values,
+    }
+    attach_glyphs(corpus, glyphs)
+    log.info("Compiled corpus: %d tokens, %d raw / %d clean types, %d pages", len(raw_ids), len(raw_vocab), len(clean_vocab), len(page_ids))
+    return corpus
+
+
+def _unfiltered(wanted):
+    return wanted is None or (isinstance(wanted, str) and wanted.lower() == "all")
+
+
+def page_mask(corpus, pages=None, **filters):
+    """Boolean mask over page rows; filters are $-header keys (or aliases like currier=) -> value or collection of values, case-insensitive.
+
+    None or "all" (the repo-wide currier="all" convention) leaves a filter off.
+    """
+    keep = np.ones(len(corpus["page_ids"]), dtype=bool)
+    if pages is not None:
+        wanted = {pages} if isinstance(pages, str) else set(pages)
+        keep &= np.fromiter((pid in wanted for pid in corpus["page_ids"]), dtype=bool, count=len(keep))
+    for name, wanted in filters.items():
+        if _unfiltered(wanted):
+            continue
+        key = META_ALIASES.get(name.lower(), name.upper())
+        if key not in corpus["meta_codes"]:
+            raise ValueError(f"Unknown metadata filter {name!r}; expected one of {META_KEYS} or {sorted(META_ALIASES)}")
+        wanted = {wanted} if isinstance(wanted, str) else set(wanted)
+        wanted = {str(v).lower() for v in wanted}
+        hit = np.asarray([v.lower() in wanted for v in corpus["meta_values"][key]], dtype=bool)
+        keep &= hit[corpus["meta_codes"][key]]
+    return keep
+
+
+def token_mask(corpus, pages=None, **filters):
+    if pages is None and all(_unfiltered(v) for v in filters.values()):
+        return None
+    return page_mask(corpus, pages=pages, **filters)[corpus["page_idx"]]
+
+
+def kept_mask(corpus, cleaned=True, currier="all", pages=None, **filters):
+    """Boolean mask over tokens: a non-empty word (cleaned ids) on a page passing the page filters."""
+    keep = token_ids(corpus, cleaned) >= 0
+    mask = token_mask(corpus, pages=pages, currier=currier, **filters)
+    if mask is not None:
+        keep &= mask
+    return keep
+
+
+def token_ids(corpus, cleaned=False):
+    return corpus["clean_ids"] if cleaned else corpus["raw_ids"]
+
+
+def token_vocab(corpus, cleaned=False):
+    return corpus["clean_vocab"] if cleaned else corpus["raw_vocab"]
+
+
+def source_digest(glyphs=DEFAULT_GLYPHS):
+    """sha1 over the sources build_corpus depends on and the glyph inventory; stored in the npz and checked by get_corpus."""
+    h = hashlib.sha1()
+    for module in source_modules:
+        h.update((Path(__file__).parent / f"{module}.py").read_bytes())
+    h.update(json.dumps(list(glyphs)).encode("utf-8"))
+    return h.hexdigest()
+
+
+def _stored_digest(path):
+    with np.load(path, allow_pickle=False) as data:
+        return str(data["source_digest"]) if "source_digest" in data.files else None
+
+
+def save_corpus(corpus, path=corpus_path):
+    arrays = {"source_digest": np.asarray(source_digest(corpus.get("glyph_inventory", DEFAULT_GLYPHS)))}
+    for key, value in corpus.items():
+        if isinstance(value, dict):
+            for sub, col in value.items():
+                arrays[f"{key}.{sub}"] = np.asarray(col, dtype=None if isinstance(col, np.ndarray) else str)
+        else:
+            arrays[key] = value if isinstance(value, np.ndarray) else np.asarray(value, dtype=str)
+    np.savez(path, **arrays)
+    return path
+
+
+def load_corpus(path=corpus_path):
+    corpus = {}
+    with np.load(path, allow_pickle=False) as data:
+        for name in data.files:
+            if name == "source_digest":
+                continue
+            col = data[name]
+            value = col.tolist() if col.dtype.kind == "U" else col
+            if "." in name:
+                key, sub = name.split(".", 1)
+                corpus.setdefault(key, {})[sub] = value
+            else:
+                corpus[name] = value
+    if "glyph_codes" not in corpus:
+        attach_glyphs(corpus)
+    return corpus
+
+
+def get_corpus(pages=None, path=corpus_path, rebuild=False):
+    """Compiled corpus for `pages`; without pages, reuse the npz cache when it is newer than voynich_parsed.json and was
+    built by the current corpus / clean / glyphs code with the default glyph inventory."""
+    if pages is not None:
+        return build_corpus(pages)
+    path = Path(path)
+    if not rebuild and path.exists() and path.stat().st_mtime >= parsed_path.stat().st_mtime:
+        if _stored_digest(path) == source_digest():
+            return load_corpus(path)
+        log.info("Rebuilding %s: corpus / clean / glyphs code or glyph inventory changed", path.name)
+    corpus = build_corpus(load_pages())
+    save_corpus(corpus, path)
+    return corpus
@@ -0,0 +1,170 @@
+"""
+Windowed co-occurrence counts, PPMI and truncated-SVD word embeddings over the compiled corpus (`corpus.py`).
+- pairs: for every offset d in 1..window, tokens i and i + d count as a pair when both are kept and in the same paragraph;
+  pair arrays are built with array shifts and summed into a scipy COO/CSR matrix (symmetric, optional 1/d weighting)
+- ppmi: log(p(w, c) / (p(w) p(c)^alpha)) clipped at 0, with context-distribution smoothing alpha (default 0.75)
+- embeddings: rows of U * S^eig from a truncated SVD of the PPMI matrix, L2-normalised for cosine queries
+- A/B: `align(emb_a, emb_b)` rotates B onto A over the shared vocabulary (orthogonal Procrustes)
+Files: co-occurrence matrices and embeddings cached under data/cache/ as npz, keyed by a hash of the token stream, vocabulary and parameters
+"""
+import hashlib
+import json
+import logging
+from pathlib import Path
+
+import numpy as np
+from scipy import sparse
+from scipy.linalg import orthogonal_procrustes
+from scipy.sparse.linalg import svds
+
+from corpus import kept_mask, token_ids, token_vocab
+
+log = logging.getLogger(__name__)
+
+data_dir = Path(__file__).parent / "data"
+cache_dir = data_dir / "cache"
+
+
+def _cache_key(corpus, prefix, **params):
+    cleaned = params.get("cleaned", True)
+    h = hashlib.sha1(token_ids(corpus, cleaned).tobytes())
+    h.update(corpus["para_offsets"].tobytes())
+    # cached word_ids are mapped back through the vocabulary, so corpora sharing an id layout must not share entries
+    h.update("\n".join(token_vocab(corpus, cleaned)).encode("utf-8"))
+    h.update(json.dumps(params, sort_keys=True, default=str).encode("utf-8"))
+    return cache_dir / f"{prefix}_{h.hexdigest()[:16]}.npz"
+
+
+def _kept_stream(corpus, cleaned=True, currier="all", min_count=1, pages=None, **filters):
+    ids = token_ids(corpus, cleaned).astype(np.int64)
+    keep = kept_mask(corpus, cleaned, currier, pages, **filters)
+    if min_count > 1:
+        counts = np.bincount(ids[keep], minlength=len(token_vocab(corpus, cleaned)))
+        keep &= counts[np.maximum(ids, 0)] >= min_count
+    return ids, keep
+
+
+def cooccurrence_matrix(corpus, window=2, cleaned=True, currier="all", min_count=1, weighting="uniform", pages=None, use_cache=True, **filters):
+    """Symmetric V x V co-occurrence counts within +-window tokens, never across paragraph boundaries."""
+    path = _cache_key(corpus, "cooc", window=window, cleaned=cleaned, currier=currier, min_count=min_count, weighting=weighting, pages=pages, filters=filters)
+    if use_cache and path.exists():
+        return sparse.load_npz(path).tocsr()
+    ids, keep = _kept_stream(corpus, cleaned=cleaned, currier=currier, min_count=min_count, pages=pages, **filters)
+    # positions are compacted first, so dropped tokens do not open gaps in the window
+    pos = np.flatnonzero(keep)
+    stream, para = ids[pos], corpus["para_idx"][pos]
+    rows, cols, vals = [], [], []
+    for d in range(1, window + 1):
+        ok = para[d:] == para[:-d]
+        rows.append(stream[:-d][ok])
+        cols.append(stream[d:][ok])
+        vals.append(np.full(int(ok.sum()), 1.0 / d if weighting == "harmonic" else 1.0))
+    rows, cols, vals = np.concatenate(rows), np.concatenate(cols), np.concatenate(vals)
+    V = len(token_vocab(corpus, cleaned))
+    M = sparse.coo_matrix((np.concatenate([vals, vals]), (np.concatenate([rows, cols]), np.concatenate([cols, rows]))), shape=(V, V)).tocsr()
+    M.sum_duplicates()
+    if use_cache:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        sparse.save_npz(path, M)
+    return M
+
+
+def ppmi_matrix(M, alpha=0.75, shift=1.0):
+    """Positive PMI of a co-occurrence matrix; `shift` > 1 subtracts log(shift) (SGNS-style negative sampling)."""
+    M = sparse.csr_matrix(M, dtype=np.float64)
+    total = M.sum()
+    if total == 0:
+        return M
+    row = np.asarray(M.sum(axis=1)).ravel()
+    col = np.asarray(M.sum(axis=0)).ravel() ** alpha
+    col_p = col / col.sum()
+    coo = M.tocoo()
+    pmi = np.log(coo.data / total) - np.log(row[coo.row] / total) - np.log(col_p[coo.col]) - np.log(shift)
+    keep = pmi > 0
+    return sparse.csr_matrix((pmi[keep], (coo.row[keep], coo.col[keep])), shape=M.shape)
+
+
+def svd_embeddings(P, dim=100, eig=0.5, seed=0):
+    """Truncated SVD of a PPMI matrix; rows are L2-normalised word vectors (zero rows stay zero)."""
+    k = max(1, min(dim, min(P.shape) - 1))
+    v0 = np.random.default_rng(seed).uniform(-1, 1, min(P.shape))
+    U, S, _ = svds(P.astype(np.float64), k=k, v0=v0)
+    order = np.argsort(S)[::-1]
+    vecs = U[:, order] * (S[order] ** eig)
+    norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+    return vecs / np.where(norms == 0, 1.0, norms)
+
+
+def build_embeddings(corpus, window=2, dim=100, cleaned=True, currier="all", min_count=5, alpha=0.75, eig=0.5, weighting="uniform", seed=0, use_cache=True, pages=None, **filters):
+    """Embeddings for every word with at least `min_count` kept tokens; returns {"vocab", "vectors", "counts", "params"}."""
+    params = {"window": window, "dim": dim, "cleaned": cleaned, "currier": currier, "min_count": min_count, "alpha": alpha, "eig": eig, "weighting": weighting, "seed": seed, "pages": pages, "filters": filters}
+    path = _cache_key(corpus, "embeddings", **params)
+    vocab_all = token_vocab(corpus, cleaned)
+    if use_cache and path.exists():
+        with np.load(path, allow_pickle=False) as data:
+            words, vectors, counts = data["word_ids"], data["vectors"], data["counts"]
+        log.info("Loaded embeddings from %s", path.name)
+        return {"vocab": [vocab_all[i] for i in words], "word_ids": words, "vectors": vectors, "counts": counts, "params": params}
+    M = cooccurrence_matrix(corpus, window=window, cleaned=cleaned, currier=currier, min_count=min_count, weighting=weighting, pages=pages, use_cache=use_cache, **filters)
+    ids, keep = _kept_stream(corpus, cleaned=cleaned, currier=currier, min_count=min_count, pages=pages, **filters)
+    counts = np.bincount(ids[keep], minlength=len(vocab_all))
+    words = np.flatnonzero(counts)
+    if len(words) < 2:
+        raise ValueError(f"{len(words)} word(s) with at least min_count={min_count} tokens after filtering (currier={currier!r}, pages={pages!r}, filters={filters}); embeddings need at least 2")
+    P = ppmi_matrix(M[words][:, words], alpha=alpha)
+    vectors = svd_embeddings(P, dim=dim, eig=eig, seed=seed)
+    if use_cache:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        np.savez(path, word_ids=words, vectors=vectors, counts=counts[words])
+    log.info("Built %d x %d embeddings (%d pair types)", vectors.shape[0], vectors.shape[1], P.nnz)
+    return {"vocab": [vocab_all[i] for i in words], "word_ids": words, "vectors": vectors, "counts": counts[words], "params": params}
+
+
+def _row(emb, word):
+    if "lookup" not in emb:
+        emb["lookup"] = {w: i for i, w in enumerate(emb["vocab"])}
+    if word not in emb["lookup"]:
+        raise KeyError(f"{word!r} not in embedding vocabulary (min_count={emb['params']['min_count']})")
+    return emb["lookup"][word]
+
+
+def nearest(emb, word, k=10):
+    """k most cosine-similar words to `word` (excluding itself)."""
+    i = _row(emb, word)
+    sims = emb["vectors"] @ emb["vectors"][i]
+    sims[i] = -np.inf
+    k = min(k, len(sims) - 1)
+    if k < 1:
+        return []
+    top = np.argpartition(-sims, k - 1)[:k]
+    top = top[np.argsort(-sims[top])]
+    return [(emb["vocab"][j], float(sims[j])) for j in top]
+
+
+def similarity(emb, a, b):
+    return float(emb["vectors"][_row(emb, a)] @ emb["vectors"][_row(emb, b)])
+
+
+def align(emb_a, emb_b):
+    """Rotate emb_b into emb_a's space over their shared words; returns (aligned copy of emb_b, shared words)."""
+    lookup_b = {w: i for i, w in enumerate(emb_b["vocab"])}
+    shared = [w for w in emb_a["vocab"] if w in lookup_b]
+    ia = np.asarray([_row(emb_a, w) for w in shared], dtype=np.int64)
+    ib = np.asarray([lookup_b[w] for w in shared], dtype=np.int64)
+    A, B = emb_a["vectors"], emb_b["vectors"]
+    dim = min(A.shape[1], B.shape[1])
+    R, _ = orthogonal_procrustes(B[ib, :dim], A[ia, :dim])
+    aligned = dict(emb_b, vectors=B[:, :dim] @ R)
+    aligned.pop("lookup", None)
+    return aligned, shared
+
+
+def cross_similarity(emb_a, aligned_b, shared):
+    """Cosine between each shared word's A vector and its aligned B vector; low values = usage shifted between A and B."""
+    lookup_b = {w: i for i, w in enumerate(aligned_b["vocab"])}
+    ia = np.asarray([_row(emb_a, w) for w in shared], dtype=np.int64)
+    ib = np.asarray([lookup_b[w] for w in shared], dtype=np.int64)
+    A = emb_a["vectors"][ia, : aligned_b["vectors"].shape[1]]
+    B = aligned_b["vectors"][ib]
+    norms = np.linalg.norm(A, axis=1) * np.linalg.norm(B, axis=1)
+    return dict(zip(shared, ((A * B).sum(axis=1) / np.where(norms == 0, 1.0, norms)).tolist()))
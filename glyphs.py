@@ -0,0 +1,223 @@
+"""
+EVA glyph tokenizer and vectorized glyph-level statistics.
+- inventory: multi-letter EVA units read as one glyph (default: benched gallows cth/ckh/cph/cfh, ch, sh, iiin, iin);
+  every other character is a glyph of its own. Tokenization is longest-match via one precompiled alternation
+  (units ordered longest first, single-character fallback), cached per (word, inventory)
+- corpus arrays (attached by corpus.build_corpus): glyph_vocab (code -> glyph string), glyph_codes / glyph_offsets
+  (CSR over clean_vocab: the glyphs of clean type t are glyph_codes[glyph_offsets[t]:glyph_offsets[t + 1]]),
+  glyph_inventory
+- statistics expand the token stream into a glyph stream once (CSR gather) and count with integer keys
+  (n-gram code = sum c_k * G^(n-1-k)), never per-character Python loops
+- encode_words: the same arrays for a plain word sequence (word_stats / ambiguous_resolver with glyphs=), so the
+  counters run on page views as well as on the compiled corpus
+"""
+import re
+from collections import Counter
+from functools import lru_cache
+
+import numpy as np
+
+DEFAULT_GLYPHS = ("cth", "ckh", "cph", "cfh", "ch", "sh", "iiin", "iin")
+
+
+@lru_cache(maxsize=None)
+def compile_tokenizer(inventory=DEFAULT_GLYPHS):
+    units = sorted(set(inventory), key=lambda g: (-len(g), g))
+    return re.compile("|".join([re.escape(u) for u in units if u] + ["."]), re.S)
+
+
+@lru_cache(maxsize=1 << 16)
+def tokenize(word, inventory=DEFAULT_GLYPHS):
+    """Glyph tuple of one word, e.g. tokenize("qokchedy") -> ("q", "o", "k", "ch", "e", "d", "y")."""
+    return tuple(compile_tokenizer(tuple(inventory)).findall(word))
+
+
+def glyph_table(vocab, inventory=DEFAULT_GLYPHS):
+    """CSR glyph codes for every vocabulary type; returns (codes, offsets, glyph_vocab)."""
+    inventory = tuple(inventory)
+    seqs = [tokenize(w, inventory) for w in vocab]
+    glyph_vocab = sorted({g for seq in seqs for g in seq})
+    lookup = {g: i for i, g in enumerate(glyph_vocab)}
+    lengths = np.fromiter((len(seq) for seq in seqs), dtype=np.int64, count=len(seqs))
+    offsets = np.zeros(len(seqs) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    codes = np.fromiter((lookup[g] for seq in seqs for g in seq), dtype=np.int16, count=int(offsets[-1]))
+    return codes, offsets, glyph_vocab
+
+
+def as_inventory(glyphs):
+    """Inventory for a `glyphs=` argument: True -> DEFAULT_GLYPHS, a collection -> that tuple, falsy -> None."""
+    if not glyphs:
+        return None
+    return DEFAULT_GLYPHS if glyphs is True else tuple(glyphs)
+
+
+def encode_words(words, inventory=DEFAULT_GLYPHS):
+    """Glyph-coded view of a plain word sequence; the glyph_* counters take it like a corpus (every word is kept)."""
+    words = np.asarray(list(words), dtype=str)
+    vocab, ids = np.unique(words, return_inverse=True)
+    codes, offsets, glyph_vocab = glyph_table(vocab.tolist(), inventory)
+    return {"clean_ids": ids.astype(np.int32), "glyph_codes": codes, "glyph_offsets": offsets, "glyph_vocab": glyph_vocab}
+
+
+def recode(corpus, glyph_vocab):
+    """Copy of a glyph-coded corpus with codes into another glyph vocabulary; glyphs missing from it get code len(glyph_vocab)."""
+    lookup = {g: i for i, g in enumerate(glyph_vocab)}
+    remap = np.asarray([lookup.get(g, len(lookup)) for g in corpus["glyph_vocab"]], dtype=np.int16)
+    return dict(corpus, glyph_codes=remap[corpus["glyph_codes"]], glyph_vocab=list(glyph_vocab))
+
+
+def attach_glyphs(corpus, inventory=DEFAULT_GLYPHS):
+    """Store the glyph table of corpus["clean_vocab"] in the corpus (in place) and return it."""
+    codes, offsets, glyph_vocab = glyph_table(corpus["clean_vocab"], inventory)
+    corpus["glyph_codes"] = codes
+    corpus["glyph_offsets"] = offsets
+    corpus["glyph_vocab"] = glyph_vocab
+    corpus["glyph_inventory"] = list(inventory)
+    return corpus
+
+
+def expand_csr(type_ids, codes, offsets):
+    """Gather the CSR rows of every token; returns (token row per element, element code)."""
+    type_ids = np.asarray(type_ids, dtype=np.int64)
+    counts = offsets[type_ids + 1] - offsets[type_ids]
+    rows = np.repeat(np.arange(len(type_ids)), counts)
+    starts = np.repeat(offsets[type_ids], counts)
+    within = np.arange(len(rows)) - np.repeat(np.cumsum(counts) - counts, counts)
+    return rows, codes[starts + within]
+
+
+def glyph_positions(corpus, currier="all", pages=None, **filters):
+    """Token positions with a non-empty cleaned word, restricted by the page filters of corpus.page_mask."""
+    from corpus import kept_mask
+
+    return np.flatnonzero(kept_mask(corpus, True, currier, pages, **filters))
+
+
+def glyph_stream(corpus, positions=None, **filters):
+    """(token row, glyph code) for every glyph of the selected tokens, in reading order."""
+    positions = glyph_positions(corpus, **filters) if positions is None else positions
+    return expand_csr(corpus["clean_ids"][positions], corpus["glyph_codes"], corpus["glyph_offsets"])
+
+
+def _keys(codes, n, base):
+    key = np.zeros(len(codes) - n + 1, dtype=np.int64)
+    for k in range(n):
+        key = key * base + codes[k:len(codes) - n + 1 + k]
+    return key
+
+
+def decode_keys(keys, n, base, labels):
+    """Integer n-gram keys -> tuples of glyph labels."""
+    out = []
+    for key in keys.tolist():
+        parts = []
+        for _ in range(n):
+            key, c = divmod(key, base)
+            parts.append(labels[c])
+        out.append(tuple(reversed(parts)))
+    return out
+
+
+def _count(keys, n, base, labels):
+    uniq, counts = np.unique(keys, return_counts=True)
+    return Counter(dict(zip(decode_keys(uniq, n, base, labels), counts.tolist())))
+
+
+def glyph_ngram_keys(corpus, n=2, base=None, positions=None, **filters):
+    """(token row, integer key) of every within-word glyph n-gram in reading order; base defaults to the glyph count."""
+    rows, codes = glyph_stream(corpus, positions, **filters)
+    if len(codes) < n:
+        return rows[:0], np.zeros(0, dtype=np.int64)
+    base = base or len(corpus["glyph_vocab"])
+    same = rows[n - 1:] == rows[:len(rows) - n + 1]
+    return rows[:len(rows) - n + 1][same], _keys(codes.astype(np.int64), n, base)[same]
+
+
+def glyph_edge_keys(corpus, n=2, position="start", positions=None, **filters):
+    """(token row, integer key) of the word-initial / word-final glyph n-gram; words with fewer than n glyphs are skipped."""
+    positions = glyph_positions(corpus, **filters) if positions is None else positions
+    ids = corpus["clean_ids"][positions].astype(np.int64)
+    offsets = corpus["glyph_offsets"]
+    starts, ends = offsets[ids], offsets[ids + 1]
+    ok = ends - starts >= n
+    first = (starts if position.lower() == "start" else ends - n)[ok]
+    G = len(corpus["glyph_vocab"])
+    key = np.zeros(len(first), dtype=np.int64)
+    for k in range(n):
+        key = key * G + corpus["glyph_codes"][first + k]
+    return np.flatnonzero(ok), key
+
+
+def glyph_ngrams(corpus, n=2, position=None, positions=None, **filters):
+    """Glyph n-gram tuples in reading order: all within-word n-grams, or only the "start" / "end" n-gram of each word."""
+    if position is None:
+        _, keys = glyph_ngram_keys(corpus, n, positions=positions, **filters)
+    else:
+        _, keys = glyph_edge_keys(corpus, n, position, positions, **filters)
+    uniq, inverse = np.unique(keys, return_inverse=True)
+    labels = decode_keys(uniq, n, len(corpus["glyph_vocab"]), corpus["glyph_vocab"])
+    return [labels[i] for i in inverse.ravel().tolist()]
+
+
+def glyph_ngram_counts(corpus, n=2, positions=None, **filters):
+    """Counter of within-word glyph n-grams (tuples of glyph strings)."""
+    _, keys = glyph_ngram_keys(corpus, n, positions=positions, **filters)
+    return _count(keys, n, len(corpus["glyph_vocab"]), corpus["glyph_vocab"])
+
+
+def glyph_edge_ngram_counts(corpus, n=2, position="start", positions=None, **filters):
+    """Counter of word-initial / word-final glyph n-grams; words with fewer than n glyphs are skipped."""
+    _, keys = glyph_edge_keys(corpus, n, position, positions, **filters)
+    return _count(keys, n, len(corpus["glyph_vocab"]), corpus["glyph_vocab"])
+
+
+def glyph_length_counts(corpus, positions=None, **filters):
+    """Counter of word lengths measured in glyphs."""
+    positions = glyph_positions(corpus, **filters) if positions is None else positions
+    lengths = np.diff(corpus["glyph_offsets"])[corpus["clean_ids"][positions]]
+    counts = np.bincount(lengths)
+    return Counter({int(i): int(c) for i, c in enumerate(counts) if c})
+
+
+def glyph_bigram_matrix(corpus, top=None, positions=None, **filters):
+    """(labels, G x G within-word glyph bigram counts); `top` keeps the most frequent glyphs only, sorted by label."""
+    rows, codes = glyph_stream(corpus, positions, **filters)
+    G = len(corpus["glyph_vocab"])
+    same = rows[1:] == rows[:-1]
+    codes = codes.astype(np.int64)
+    mat = np.bincount(codes[:-1][same] * G + codes[1:][same], minlength=G * G).reshape(G, G)
+    keep = np.arange(G)
+    if top:
+        keep = np.sort(np.argsort(np.bincount(codes, minlength=G))[::-1][:top])
+    return [corpus["glyph_vocab"][i] for i in keep], mat[np.ix_(keep, keep)]
+
+
+def glyph_entropy(corpus, max_order=3, boundaries=True, positions=None, **filters):
+    """Block entropies H_1..H_k (bits) and conditional entropies h_k = H_k - H_(k-1) of the glyph stream.
+
+    With boundaries=True a word-space symbol follows every word (as in classic character entropy studies);
+    otherwise n-grams are taken within words only.
+    """
+    rows, codes = glyph_stream(corpus, positions, **filters)
+    G = len(corpus["glyph_vocab"])
+    codes = codes.astype(np.int64)
+    if boundaries:
+        n_words = int(rows[-1]) + 1 if len(rows) else 0
+        stream = np.full(len(codes) + n_words, G, dtype=np.int64)
+        stream[np.arange(len(codes)) + rows] = codes
+        base = G + 1
+    else:
+        stream, base = codes, G
+    H = []
+    for n in range(1, max_order + 1):
+        if len(stream) < n:
+            break
+        keys = _keys(stream, n, base)
+        if not boundaries:
+            keys = keys[rows[n - 1:] == rows[:len(rows) - n + 1]]
+        _, counts = np.unique(keys, return_counts=True)
+        p = counts / counts.sum()
+        H.append(float(-(p * np.log2(p)).sum()))
+    h = [H[0]] + [b - a for a, b in zip(H, H[1:])] if H else []
+    return {"H": H, "h": h, "H0": float(np.log2(base))}
@@ -5,6 +5,8 @@ Data shape:
 - line: {"id": "f1r.1", "marker": "@P0", "text": raw text, "words": list[str]}
 - words: split on "." only; punctuation like "?" or "<->" is preserved inside words
 Files: reads data/RF1b-e.txt, writes JSON outputs in data/
+Module attributes (pages, paragraphs_by_page, plain_texts, ...) are built on first access through the pipeline cache (pipeline.py);
+`python load_voynich_transcription.py` regenerates the JSON outputs directly.
 """
 from pathlib import Path
 import json, logging, re
@@ -113,19 +115,41 @@ def page_plain_text(pages, ordered_pages, page_or_number, cleaned=False):
     blocks = page_paragraph_words(pages, ordered_pages, page_or_number, cleaned=cleaned)
     return "\n".join(" ".join(words) for words in blocks)
 
-def generate_outputs():
-    pages = parse_pages()
+def generate_outputs(pages=None, write=True):
+    pages = parse_pages() if pages is None else pages
     ordered_pages, page_to_number = build_page_order(pages)
     currier_by_page = build_currier_index(pages)
-    write_json(pages, parsed_path)
     paragraphs_by_page = {pid: page_paragraph_words(pages, ordered_pages, pid) for pid in ordered_pages}
-    write_json(paragraphs_by_page, paragraph_path)
     plain_texts = {pid: page_plain_text(pages, ordered_pages, pid) for pid in ordered_pages}
-    write_json(plain_texts, plain_text_path)
     page_index = {"ordered_pages": ordered_pages, "page_to_number": page_to_number, "currier_by_page": currier_by_page}
-    write_json(page_index, page_index_path)
-    log.info("Wrote %s pages into %s", len(pages), parsed_path.name)
-    return pages, paragraphs_by_page, plain_texts, page_index, ordered_pages, page_to_number
+    if write:
+        write_json(pages, parsed_path)
+        write_json(paragraphs_by_page, paragraph_path)
+        write_json(plain_texts, plain_text_path)
+        write_json(page_index, page_index_path)
+        log.info("Wrote %s pages into %s", len(pages), parsed_path.name)
+    return {
+        "paragraphs_by_page": paragraphs_by_page,
+        "plain_texts": plain_texts,
+        "page_index": page_index,
+        "ordered_pages": ordered_pages,
+        "page_to_number": page_to_number,
+        "currier_by_page": currier_by_page,
+    }
 
-pages, paragraphs_by_page, plain_texts, page_index, ordered_pages, page_to_number = generate_outputs()
-currier_by_page = page_index.get("currier_by_page", {})
\ No newline at end of file
+_lazy_outputs = ("pages", "paragraphs_by_page", "plain_texts", "page_index", "ordered_pages", "page_to_number", "currier_by_page")
+
+
+def __getattr__(name):
+    if name not in _lazy_outputs:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from pipeline import run
+
+    artifacts = run(["parse", "corpus"], n_jobs=1)
+    views = artifacts["corpus"]
+    globals().update({"pages": artifacts["parse"], **{k: views[k] for k in _lazy_outputs[1:]}})
+    return globals()[name]
+
+
+if __name__ == "__main__":
+    generate_outputs()
@@ -0,0 +1,327 @@
+"""
+Null-model corpora for baseline comparison, integer-coded with the same shape as the compiled corpus (`corpus.py`).
+- every generator returns a corpus dict sharing the page / paragraph / line columns of the input; only
+  raw_ids / clean_ids (and, for generated words, raw_vocab / clean_vocab) change
+- shuffle_corpus: permute tokens within each line / paragraph / page / the whole corpus (lexsort on (group, random key))
+- markov_corpus: Markov chain of order k over EVA glyphs (glyphs.py; units="char" for single letters) trained on the
+  cleaned word counts (boundary-padded n-grams), sampling all words of the corpus in parallel one glyph step at a time
+- self_citation_corpus: copy a word from the previous `lookback` lines of the same page and mutate it with probability
+  p_modify into a one-edit neighbour (weighted by frequency), or draw a fresh word with probability p_fresh; one
+  vectorized step per line
+- null_samples: run a generator + statistic over many SeedSequence-spawned seeds in a process pool; the corpus is
+  published once in shared memory (shared_corpus.py) and attached by every worker without copying
+- to_paragraphs_by_page / to_plain_texts: adapters for word_stats and tfidf_keyness
+"""
+import logging
+import os
+from collections import defaultdict
+
+import numpy as np
+
+from corpus import kept_mask, token_ids, token_vocab
+from glyphs import DEFAULT_GLYPHS, attach_glyphs
+from shared_corpus import shared_pool, worker_corpus
+
+log = logging.getLogger(__name__)
+
+BOUNDARY = "\x00"
+
+
+def _rng(seed):
+    return seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+
+
+def _with_ids(corpus, ids, vocab):
+    out = dict(corpus)
+    out["raw_ids"] = out["clean_ids"] = ids
+    out["raw_vocab"] = out["clean_vocab"] = vocab
+    return attach_glyphs(out, corpus.get("glyph_inventory", DEFAULT_GLYPHS))
+
+
+def _group_column(corpus, scope):
+    if scope == "line":
+        return corpus["line_idx"]
+    if scope == "paragraph":
+        return corpus["para_idx"]
+    if scope == "page":
+        return corpus["page_idx"]
+    if scope == "corpus":
+        return np.zeros(len(corpus["raw_ids"]), dtype=np.int32)
+    raise ValueError(f"Unknown shuffle scope {scope!r}; expected line, paragraph, page or corpus")
+
+
+def shuffle_corpus(corpus, seed=0, scope="paragraph"):
+    """Word order destroyed inside each `scope` group; vocabulary, counts and group sizes unchanged."""
+    rng = _rng(seed)
+    order = np.lexsort((rng.random(len(corpus["raw_ids"])), _group_column(corpus, scope)))
+    out = dict(corpus)
+    out["raw_ids"] = corpus["raw_ids"][order]
+    out["clean_ids"] = corpus["clean_ids"][order]
+    return out
+
+
+def _training_counts(corpus, cleaned=True, currier="all", pages=None, **filters):
+    ids = token_ids(corpus, cleaned)
+    keep = kept_mask(corpus, cleaned, currier, pages, **filters)
+    return np.bincount(ids[keep], minlength=len(token_vocab(corpus, cleaned)))
+
+
+def train_markov(corpus, order=2, units="glyph", currier="all", pages=None, **filters):
+    """Order-k transition table over glyphs (corpus glyph table) or EVA letters (units="char"), from the cleaned word counts.
+
+    Contexts are boundary-padded and every word ends on the boundary symbol.
+    """
+    vocab = token_vocab(corpus, True)
+    counts = _training_counts(corpus, cleaned=True, currier=currier, pages=pages, **filters)
+    if units == "glyph":
+        offsets, codes = corpus["glyph_offsets"], corpus["glyph_codes"].tolist()
+        seqs = [[g + 1 for g in codes[offsets[t]:offsets[t + 1]]] for t in range(len(vocab))]
+        alphabet = [BOUNDARY] + list(corpus["glyph_vocab"])
+    else:
+        alphabet = [BOUNDARY] + sorted({ch for w, c in zip(vocab, counts) if c for ch in w})
+        code = {ch: i for i, ch in enumerate(alphabet)}
+        seqs = [[code[ch] for ch in w] if c else [] for w, c in zip(vocab, counts)]
+    A = len(alphabet)
+    trans = defaultdict(float)
+    for seq, c in zip(seqs, counts):
+        if not c:
+            continue
+        seq = [0] * order + seq + [0]
+        for i in range(order, len(seq)):
+            ctx = 0
+            for s in seq[i - order:i]:
+                ctx = ctx * A + s
+            trans[(ctx, seq[i])] += c
+    contexts = np.asarray(sorted({ctx for ctx, _ in trans}), dtype=np.int64)
+    row_of = {ctx: i for i, ctx in enumerate(contexts.tolist())}
+    probs = np.zeros((len(contexts), A))
+    for (ctx, nxt), c in trans.items():
+        probs[row_of[ctx], nxt] = c
+    probs /= probs.sum(axis=1, keepdims=True)
+    lengths = np.asarray([len(seq) for seq in seqs])
+    max_len = int(lengths[counts > 0].max()) if counts.any() else 1
+    return {"order": order, "units": units, "alphabet": alphabet, "contexts": contexts, "cum": np.cumsum(probs, axis=1), "max_len": max_len}
+
+
+def sample_markov_words(model, n, seed=0, max_len=None):
+    """n words sampled in parallel; returns (glyph code matrix n x max_len, word lengths)."""
+    rng = _rng(seed)
+    A = len(model["alphabet"])
+    k = model["order"]
+    max_len = max_len or model["max_len"]
+    out = np.zeros((n, max_len), dtype=np.int16)
+    lengths = np.full(n, max_len, dtype=np.int64)
+    ctx = np.zeros(n, dtype=np.int64)
+    active = np.arange(n)
+    wrap = A ** k
+    for step in range(max_len):
+        rows = np.searchsorted(model["contexts"], ctx[active])
+        u = rng.random(len(active))
+        nxt = (model["cum"][rows] < u[:, None]).sum(axis=1)
+        nxt = np.minimum(nxt, A - 1)
+        done = nxt == 0
+        lengths[active[done]] = step
+        live = active[~done]
+        out[live, step] = nxt[~done]
+        ctx[live] = (ctx[live] * A + nxt[~done]) % wrap
+        active = live
+        if not len(active):
+            break
+    return out, lengths
+
+
+def _codes_to_vocab(glyphs, lengths, alphabet):
+    """Unique generated words -> (token ids, vocab); strings are only built once per distinct word."""
+    rows = np.ascontiguousarray(glyphs).view(np.dtype((np.void, glyphs.shape[1] * glyphs.itemsize))).ravel()
+    _, first, inverse = np.unique(rows, return_index=True, return_inverse=True)
+    vocab = ["".join(alphabet[c] for c in row[:ln]) for row, ln in zip(glyphs[first].tolist(), lengths[first].tolist())]
+    return inverse.ravel().astype(np.int32), vocab
+
+
+def markov_corpus(corpus, model=None, seed=0, order=2, units="glyph"):
+    """Same token slots as `corpus`, every word replaced by an independent draw from the glyph Markov chain."""
+    model = model or train_markov(corpus, order=order, units=units)
+    glyphs, lengths = sample_markov_words(model, len(corpus["raw_ids"]), seed=seed)
+    ids, vocab = _codes_to_vocab(glyphs, lengths, model["alphabet"])
+    return _with_ids(corpus, ids, vocab)
+
+
+def _one_edit(a, b):
+    """True when b is a single substitution, insertion or deletion away from a."""
+    if len(a) > len(b):
+        a, b = b, a
+    if len(b) - len(a) > 1 or a == b:
+        return False
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    return a[i + 1:] == b[i + 1:] if len(a) == len(b) else a[i:] == b[i + 1:]
+
+
+def edit_neighbours(vocab, counts, min_count=2):
+    """CSR of one-edit (substitution / insertion / deletion) neighbours among words with at least `min_count` tokens."""
+    words = {w: i for i, (w, c) in enumerate(zip(vocab, counts)) if c >= min_count}
+    substitutions = defaultdict(set)
+    neigh = [set() for _ in vocab]
+    for w, i in words.items():
+        for j in range(len(w)):
+            substitutions[w[:j] + "\x01" + w[j + 1:]].add(i)
+            # a deletion key only matches a whole word one character shorter (deletion / insertion pair)
+            k = words.get(w[:j] + w[j + 1:])
+            if k is not None:
+                neigh[i].add(k)
+                neigh[k].add(i)
+    for group in substitutions.values():
+        if len(group) > 1:
+            for i in group:
+                neigh[i] |= group
+    offsets, cols = [0], []
+    for i, group in enumerate(neigh):
+        group.discard(i)
+        cols.extend(sorted(group))
+        offsets.append(len(cols))
+    assert all(_one_edit(vocab[i], vocab[j]) for i in range(len(vocab)) for j in cols[offsets[i]:offsets[i + 1]])
+    cols = np.asarray(cols, dtype=np.int64)
+    weights = np.asarray(counts, dtype=float)[cols] if len(cols) else np.zeros(0)
+    return {"offsets": np.asarray(offsets, dtype=np.int64), "cols": cols, "cum": np.cumsum(weights)}
+
+
+def _mutate(ids, neighbours, u):
+    offsets, cols, cum = neighbours["offsets"], neighbours["cols"], neighbours["cum"]
+    start, end = offsets[ids], offsets[ids + 1]
+    has = end > start
+    out = ids.copy()
+    if not has.any():
+        return out
+    lo = np.where(start > 0, cum[np.maximum(start - 1, 0)], 0.0)[has]
+    hi = cum[end[has] - 1]
+    pick = np.searchsorted(cum, lo + u[has] * (hi - lo), side="right")
+    out[has] = cols[np.minimum(pick, end[has] - 1)]
+    return out
+
+
+def self_citation_corpus(corpus, seed=0, lookback=3, p_modify=0.5, p_fresh=0.1, cleaned=True, neighbours=None):
+    """Copy-and-modify text: each word copies a random word of the previous `lookback` lines on the page."""
+    rng = _rng(seed)
+    vocab = token_vocab(corpus, cleaned)
+    counts = _training_counts(corpus, cleaned=cleaned)
+    neighbours = neighbours or edit_neighbours(vocab, counts)
+    unigram = np.cumsum(counts / counts.sum())
+    offsets = corpus["line_offsets"]
+    line_page = corpus["para_page"][corpus["line_para"]]
+    N = len(corpus["raw_ids"])
+    out = np.zeros(N, dtype=np.int64)
+    fresh = np.minimum(np.searchsorted(unigram, rng.random(N), side="right"), len(vocab) - 1)
+    u_src, u_mod, u_pick, u_fresh = rng.random(N), rng.random(N), rng.random(N), rng.random(N)
+    page_first = 0
+    for line in range(len(offsets) - 1):
+        s, e = offsets[line], offsets[line + 1]
+        if line and line_page[line] != line_page[line - 1]:
+            page_first = line
+        src_start = offsets[max(page_first, line - lookback)]
+        if s == e:
+            continue
+        if src_start == s:
+            out[s:e] = fresh[s:e]
+            continue
+        src = src_start + (u_src[s:e] * (s - src_start)).astype(np.int64)
+        words = out[src]
+        modify = u_mod[s:e] < p_modify
+        words[modify] = _mutate(words[modify], neighbours, u_pick[s:e][modify])
+        new = u_fresh[s:e] < p_fresh
+        words[new] = fresh[s:e][new]
+        out[s:e] = words
+    return _with_ids(corpus, out.astype(np.int32), list(vocab))
+
+
+GENERATORS = {"shuffle": shuffle_corpus, "markov": markov_corpus, "self_citation": self_citation_corpus}
+
+def _draw(corpus, generator, gen_kwargs, stat, stat_kwargs, seeds):
+    make = GENERATORS[generator]
+    return [stat(make(corpus, seed=np.random.default_rng(s), **gen_kwargs), **stat_kwargs) for s in seeds]
+
+
+def _run_batch(args):
+    return _draw(worker_corpus(), *args)
+
+
+def null_samples(corpus, generator="shuffle", stat=None, n=100, seed=0, n_jobs=None, batch_size=None, gen_kwargs=None, stat_kwargs=None):
+    """`stat(null_corpus)` for n null corpora; seeds are spawned from `seed`, so results do not depend on n_jobs.
+
+    `stat` must be a module-level function (it is sent to worker processes). Workers read the corpus from shared memory
+    (shared_corpus.py), so string columns arrive there as numpy str arrays.
+    The Markov model / edit neighbours are built once here unless passed through gen_kwargs (model=..., neighbours=...).
+    """
+    stat = stat or type_token_ratio
+    gen_kwargs, stat_kwargs = dict(gen_kwargs or {}), stat_kwargs or {}
+    cleaned = gen_kwargs.get("cleaned", True)
+    if generator == "markov" and "model" not in gen_kwargs:
+        gen_kwargs["model"] = train_markov(corpus, order=gen_kwargs.pop("order", 2), units=gen_kwargs.pop("units", "glyph"))
+    if generator == "self_citation" and "neighbours" not in gen_kwargs:
+        gen_kwargs["neighbours"] = edit_neighbours(token_vocab(corpus, cleaned), _training_counts(corpus, cleaned=cleaned))
+    seeds = np.random.SeedSequence(seed).spawn(n)
+    if n_jobs == 1:
+        return _draw(corpus, generator, gen_kwargs, stat, stat_kwargs, seeds)
+    batch_size = batch_size or max(1, n // (4 * (n_jobs or os.cpu_count() or 1)))
+    batches = [(generator, gen_kwargs, stat, stat_kwargs, seeds[i:i + batch_size]) for i in range(0, n, batch_size)]
+    with shared_pool(corpus, max_workers=n_jobs) as pool:
+        results = [v for batch in pool.map(_run_batch, batches) for v in batch]
+    log.info("Drew %d %s null samples", len(results), generator)
+    return results
+
+
+def type_token_ratio(corpus, cleaned=True):
+    ids = token_ids(corpus, cleaned)
+    ids = ids[ids >= 0]
+    return len(np.unique(ids)) / len(ids) if len(ids) else 0.0
+
+
+def zipf_slope(corpus, cleaned=True, top_n=200):
+    """Least-squares slope of log frequency vs log rank over the top_n words."""
+    ids = token_ids(corpus, cleaned)
+    freqs = np.sort(np.bincount(ids[ids >= 0]))[::-1][:top_n]
+    freqs = freqs[freqs > 0]
+    if len(freqs) < 2:
+        return 0.0
+    return float(np.polyfit(np.log(np.arange(1, len(freqs) + 1)), np.log(freqs), 1)[0])
+
+
+def word_bigram_entropy(corpus, cleaned=True):
+    """Conditional entropy H(next word | word) in bits over within-paragraph bigrams."""
+    ids = token_ids(corpus, cleaned).astype(np.int64)
+    same = (corpus["para_idx"][1:] == corpus["para_idx"][:-1]) & (ids[1:] >= 0) & (ids[:-1] >= 0)
+    a, b = ids[:-1][same], ids[1:][same]
+    if not len(a):
+        return 0.0
+    _, pair_counts = np.unique(a * (ids.max() + 1) + b, return_counts=True)
+    first_counts = np.bincount(a)
+    first_counts = first_counts[first_counts > 0]
+    n = len(a)
+    return float(-(pair_counts / n * np.log2(pair_counts / n)).sum() + (first_counts / n * np.log2(first_counts / n)).sum())
+
+
+def empirical_p(observed, null_values, tail="two-sided"):
+    null_values = np.asarray(null_values, dtype=float)
+    lo = (np.sum(null_values <= observed) + 1) / (len(null_values) + 1)
+    hi = (np.sum(null_values >= observed) + 1) / (len(null_values) + 1)
+    if tail == "less":
+        return float(lo)
+    if tail == "greater":
+        return float(hi)
+    return float(min(1.0, 2 * min(lo, hi)))
+
+
+def to_paragraphs_by_page(corpus, cleaned=True):
+    """page_id -> list of paragraphs (word lists), the shape word_stats functions take."""
+    ids = token_ids(corpus, cleaned)
+    vocab = token_vocab(corpus, cleaned)
+    out = {pid: [] for pid in corpus["page_ids"]}
+    offsets = corpus["para_offsets"]
+    for p, page in enumerate(corpus["para_page"].tolist()):
+        out[corpus["page_ids"][page]].append([vocab[t] for t in ids[offsets[p]:offsets[p + 1]] if t >= 0])
+    return out
+
+
+def to_plain_texts(corpus, cleaned=True):
+    """page_id -> plain text (paragraphs joined by newlines), the shape tfidf_keyness.group_documents takes."""
+    return {pid: "\n".join(" ".join(words) for words in paras) for pid, paras in to_paragraphs_by_page(corpus, cleaned).items()}
@@ -0,0 +1,430 @@
+"""
+Cached DAG pipeline: parse -> corpus -> resolver_a / resolver_b -> clean -> stats_a / stats_b -> tfidf, reference_* -> plots_data.
+- stage = {"fn": callable(inputs, **params), "deps": upstream stage names, "params": defaults, "files": params holding input paths,
+  "modules": repo modules the stage calls into (with their local imports), "outputs": callable(**params) -> [(path, writer)],
+  "curated": outputs may be edited by hand (never overwritten once they differ from what run() last wrote)}
+- key = sha1 over stage name, stage function source, the source files of its modules, params, digests of input files and
+  the keys of all deps (so a change anywhere upstream makes every downstream key stale); artifacts are pickled to
+  data/cache/pipeline/<stage>-<key>.pkl
+- run(): only stages whose artifact is missing (or forced) execute; ready stages run concurrently in a process pool.
+  Declared outputs in data/ are written by run() from the artifact after a stage executes, and rewritten on a cache hit
+  when they are missing
+- CLI: python pipeline.py [targets ...] [--force STAGE ...] [--jobs N] [--set stage.param=value ...] [--status]
+"""
+import argparse
+import copy
+import hashlib
+import inspect
+import json
+import logging
+import os
+import pickle
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+log = logging.getLogger(__name__)
+
+base_path = Path(__file__).resolve().parent
+data_dir = base_path / "data"
+cache_dir = data_dir / "cache" / "pipeline"
+reference_languages = ("english", "german", "french", "spanish")
+
+
+def stage_parse(inputs, source):
+    from load_voynich_transcription import parse_pages
+
+    return parse_pages(Path(source))
+
+
+def stage_corpus(inputs, write_outputs=True):
+    """Page views from load_voynich_transcription.generate_outputs plus the compiled corpus (JSON / npz outputs: outputs_corpus)."""
+    from corpus import build_corpus
+    from load_voynich_transcription import generate_outputs
+
+    pages = inputs["parse"]
+    return {**generate_outputs(pages, write=False), "compiled": build_corpus(pages)}
+
+
+def outputs_corpus(write_outputs=True):
+    import load_voynich_transcription as lvt
+    from corpus import corpus_path, save_corpus
+
+    if not write_outputs:
+        return []
+    return [
+        (lvt.parsed_path, lambda path, artifact, inputs: lvt.write_json(inputs["parse"], path)),
+        (lvt.paragraph_path, lambda path, artifact, inputs: lvt.write_json(artifact["paragraphs_by_page"], path)),
+        (lvt.plain_text_path, lambda path, artifact, inputs: lvt.write_json(artifact["plain_texts"], path)),
+        (lvt.page_index_path, lambda path, artifact, inputs: lvt.write_json(artifact["page_index"], path)),
+        (corpus_path, lambda path, artifact, inputs: save_corpus(artifact["compiled"], path)),
+    ]
+
+
+def stage_resolver(inputs, currier, freq_min=3, weights=(1.0, 0.4, 0.2), glyphs=None, output=None):
+    """analyze_ambiguous for one Currier language; run() writes the results to `output`."""
+    from ambiguous_resolver import analyze_ambiguous
+
+    currier_map = inputs["corpus"]["currier_by_page"]
+    return analyze_ambiguous(inputs["parse"], currier=currier, cleaned=False, weights=tuple(weights), freq_min=freq_min, glyphs=glyphs, currier_map=currier_map)
+
+
+def outputs_resolver(output=None, **params):
+    from ambiguous_resolver import write_results
+
+    return [(Path(output), lambda path, artifact, inputs: write_results(path, artifact))] if output else []
+
+
+def stage_clean(inputs, prob_thresh=0.5, gap_thresh=1.5, results_a=None, results_b=None):
+    """Cleaned page views; each page's ambiguous tokens are resolved with its own Currier language's mapping.
+
+    The mappings come from the curated data/ambiguous_{a,b}.json (results_a / results_b, so hand fixes apply and their
+    digests are part of the key), falling back to the resolver artifacts when a file is missing.
+    """
+    from ambiguous_resolver import mapping_from_results
+    from clean import clean_words
+
+    def resolver_results(c, path):
+        if path and Path(path).exists():
+            return json.loads(Path(path).read_text(encoding="utf-8"))
+        return inputs[f"resolver_{c}"]
+
+    views = inputs["corpus"]
+    curated = {"a": results_a, "b": results_b}
+    mappings = {c: mapping_from_results(resolver_results(c, curated[c]), prob_thresh=prob_thresh, gap_thresh=gap_thresh) for c in ("a", "b")}
+    paragraphs_by_page, plain_texts = {}, {}
+    for pid, paras in views["paragraphs_by_page"].items():
+        resolver = mappings.get(str(views["currier_by_page"].get(pid, "")).lower())
+        paragraphs_by_page[pid] = [clean_words(words, resolver=resolver, prob_thresh=prob_thresh, gap_thresh=gap_thresh) for words in paras]
+        plain_texts[pid] = "\n".join(" ".join(words) for words in paragraphs_by_page[pid])
+    return {"paragraphs_by_page": paragraphs_by_page, "plain_texts": plain_texts, "mappings": mappings}
+
+
+def stage_stats(inputs, currier, glyphs=None):
+    """The per-Currier statistics of voynich_word_stats.ipynb, on the cleaned + resolved paragraphs (glyph units if `glyphs`)."""
+    import word_stats as ws
+
+    pbp = inputs["clean"]["paragraphs_by_page"]
+    cmap = inputs["corpus"]["currier_by_page"]
+    wc = ws.word_counter(pbp, currier=currier, currier_map=cmap)
+    wl_counts = ws.word_length_counts(pbp, currier=currier, currier_map=cmap, glyphs=glyphs)
+    return {
+        "wc": wc,
+        "wl_counts": wl_counts,
+        "wb_counts": ws.word_bigram_counter(pbp, currier=currier, currier_map=cmap),
+        "cb_counts": ws.char_ngram_counter(pbp, n=2, currier=currier, currier_map=cmap, glyphs=glyphs),
+        "ct_counts": ws.char_ngram_counter(pbp, n=3, currier=currier, currier_map=cmap, glyphs=glyphs),
+        "start_bi": ws.word_edge_ngram_counter(pbp, n=2, currier=currier, position="start", glyphs=glyphs, currier_map=cmap),
+        "end_bi": ws.word_edge_ngram_counter(pbp, n=2, currier=currier, position="end", glyphs=glyphs, currier_map=cmap),
+        "start_tri": ws.word_edge_ngram_counter(pbp, n=3, currier=currier, position="start", glyphs=glyphs, currier_map=cmap),
+        "end_tri": ws.word_edge_ngram_counter(pbp, n=3, currier=currier, position="end", glyphs=glyphs, currier_map=cmap),
+        "zipf": ws.zipf_series(wc, top_n=200),
+        "tokens": sum(wc.values()),
+        "types": len(wc),
+        "ttr": ws.type_token_ratio(pbp, currier=currier, currier_map=cmap),
+        "hapax": sum(1 for v in wc.values() if v == 1),
+    }
+
+
+def stage_reference(inputs, language):
+    from reference_languages import language_stats_for
+
+    return language_stats_for(language)
+
+
+def stage_tfidf(inputs, currier="all", exclude_hapax=False, k=20, min_weight=0.15, n_similar=5):
+    import tfidf_keyness as tk
+
+    views = inputs["corpus"]
+    labels, docs = tk.group_documents(inputs["clean"]["plain_texts"], views["ordered_pages"], currier=currier, exclude_hapax=exclude_hapax, currier_map=views["currier_by_page"])
+    vectorizer, X, vocab = tk.build_tfidf(docs)
+    return {
+        "labels": labels,
+        "docs": docs,
+        "vectorizer": vectorizer,
+        "tfidf_matrix": X,
+        "vocab": vocab,
+        "top_terms": tk.top_terms_by_label(labels, X, vocab, k=k),
+        "strong_top_terms": tk.strong_terms(labels, X, vocab, min_weight=min_weight, k=k),
+        "similar_pages": tk.top_similar(labels, X, n=n_similar),
+    }
+
+
+def stage_plots_data(inputs, top_n=30, output=None):
+    """JSON-ready inputs of the README plots: Currier A/B stats next to the reference languages; run() writes them to `output`."""
+    full = ("wl_counts", "cb_counts", "ct_counts")
+
+    def export(stats):
+        out = {}
+        for key, value in stats.items():
+            if isinstance(value, dict):
+                items = Counter(value).most_common(None if key in full else top_n)
+                value = {" ".join(k) if isinstance(k, tuple) else str(k): int(v) for k, v in items}
+            out[key] = value
+        return out
+
+    data = {
+        "currier": {c: export(inputs[f"stats_{c}"]) for c in ("a", "b")},
+        "reference": {name.split("_", 1)[1]: export(stats) for name, stats in inputs.items() if name.startswith("reference_")},
+    }
+    return data
+
+
+def outputs_plots_data(output=None, **params):
+    def write(path, artifact, inputs):
+        path.write_text(json.dumps(artifact, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    return [(Path(output), write)] if output else []
+
+
+stats_modules = ("word_stats", "clean", "glyphs")
+resolver_modules = ("ambiguous_resolver", *stats_modules)
+
+STAGES = {
+    "parse": {"fn": stage_parse, "deps": (), "params": {"source": str(data_dir / "RF1b-er.txt")}, "files": ("source",), "modules": ("load_voynich_transcription", "clean")},
+    "corpus": {"fn": stage_corpus, "deps": ("parse",), "params": {"write_outputs": True}, "modules": ("load_voynich_transcription", "clean", "corpus", "glyphs"), "outputs": outputs_corpus},
+    # the Currier split comes from corpus["currier_by_page"], not from data/voynich_page_index.json on disk
+    "resolver_a": {"fn": stage_resolver, "deps": ("parse", "corpus"), "params": {"currier": "a", "freq_min": 3, "weights": (1.0, 0.4, 0.2), "glyphs": None, "output": str(data_dir / "ambiguous_a.json")}, "modules": resolver_modules, "outputs": outputs_resolver, "curated": True},
+    "resolver_b": {"fn": stage_resolver, "deps": ("parse", "corpus"), "params": {"currier": "b", "freq_min": 3, "weights": (1.0, 0.4, 0.2), "glyphs": None, "output": str(data_dir / "ambiguous_b.json")}, "modules": resolver_modules, "outputs": outputs_resolver, "curated": True},
+    "clean": {
+        "fn": stage_clean,
+        "deps": ("corpus", "resolver_a", "resolver_b"),
+        "params": {"prob_thresh": 0.5, "gap_thresh": 1.5, "results_a": str(data_dir / "ambiguous_a.json"), "results_b": str(data_dir / "ambiguous_b.json")},
+        "files": ("results_a", "results_b"),
+        "modules": resolver_modules,
+    },
+    "stats_a": {"fn": stage_stats, "deps": ("corpus", "clean"), "params": {"currier": "a", "glyphs": None}, "modules": stats_modules},
+    "stats_b": {"fn": stage_stats, "deps": ("corpus", "clean"), "params": {"currier": "b", "glyphs": None}, "modules": stats_modules},
+    "tfidf": {"fn": stage_tfidf, "deps": ("corpus", "clean"), "params": {"currier": "all", "exclude_hapax": False, "k": 20, "min_weight": 0.15, "n_similar": 5}, "modules": ("tfidf_keyness", *stats_modules)},
+    **{f"reference_{lang}": {"fn": stage_reference, "deps": (), "params": {"language": lang}, "modules": ("reference_languages",)} for lang in reference_languages},
+    "plots_data": {
+        "fn": stage_plots_data,
+        "deps": ("stats_a", "stats_b", *(f"reference_{lang}" for lang in reference_languages)),
+        "params": {"top_n": 30, "output": str(data_dir / "plots_data.json")},
+        "outputs": outputs_plots_data,
+    },
+}
+
+
+def configure(overrides=None):
+    """Copy of STAGES with parameter overrides {stage: {param: value}} applied."""
+    stages = copy.deepcopy(STAGES)
+    for name, params in (overrides or {}).items():
+        if name not in stages:
+            raise ValueError(f"Unknown stage {name!r}; expected one of {list(stages)}")
+        unknown = set(params) - set(stages[name]["params"])
+        if unknown:
+            raise ValueError(f"Unknown parameters {sorted(unknown)} for stage {name!r}")
+        stages[name]["params"].update(params)
+    return stages
+
+
+def topo_order(stages, targets=None):
+    """Targets and all their ancestors, dependencies first."""
+    order, seen = [], set()
+
+    def visit(name, path=()):
+        if name in path:
+            raise ValueError(f"Cycle in pipeline: {' -> '.join(path + (name,))}")
+        if name in seen:
+            return
+        if name not in stages:
+            raise ValueError(f"Unknown stage {name!r}; expected one of {list(stages)}")
+        for dep in stages[name]["deps"]:
+            visit(dep, path + (name,))
+        seen.add(name)
+        order.append(name)
+
+    for name in targets or stages:
+        visit(name)
+    return order
+
+
+def _file_digest(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def stage_key(name, spec, dep_keys):
+    h = hashlib.sha1(name.encode("utf-8"))
+    h.update(inspect.getsource(spec["fn"]).encode("utf-8"))
+    for module in spec.get("modules", ()):
+        h.update(_file_digest(base_path / f"{module}.py").encode("utf-8"))
+    h.update(json.dumps(spec["params"], sort_keys=True, default=str).encode("utf-8"))
+    for param in spec.get("files", ()):
+        path = spec["params"][param]
+        h.update((_file_digest(path) if path and Path(path).exists() else "missing").encode("utf-8"))
+    for dep in spec["deps"]:
+        h.update(dep_keys[dep].encode("utf-8"))
+    return h.hexdigest()
+
+
+def stage_keys(stages, order):
+    """Keys from the files as they are now; run() recomputes each key once the stage's dependencies are done."""
+    keys = {}
+    for name in order:
+        keys[name] = stage_key(name, stages[name], keys)
+    return keys
+
+
+def artifact_path(name, key, cache=cache_dir):
+    return Path(cache) / f"{name}-{key[:16]}.pkl"
+
+
+def _load(path):
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def _execute(name, params, inputs, path):
+    """Run one stage and persist its artifact (executes inside a worker process)."""
+    logging.basicConfig(level=logging.INFO)
+    artifact = STAGES[name]["fn"](inputs, **params)
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        pickle.dump(artifact, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+    return artifact
+
+
+def declared_outputs(spec):
+    return spec["outputs"](**spec["params"]) if "outputs" in spec else []
+
+
+def status(targets=None, overrides=None, cache=cache_dir):
+    """{stage: "stale" | "cached" | "outputs missing"} (the last one is rewritten from the artifact by run())."""
+    stages = configure(overrides)
+    order = topo_order(stages, targets)
+    keys = stage_keys(stages, order)
+    out = {}
+    for name in order:
+        if not artifact_path(name, keys[name], cache).exists():
+            out[name] = "stale"
+        elif any(not Path(path).exists() for path, _ in declared_outputs(stages[name])):
+            out[name] = "outputs missing"
+        else:
+            out[name] = "cached"
+    return out
+
+
+def run(targets=None, force=(), n_jobs=None, overrides=None, cache=cache_dir):
+    """Bring `targets` (default: every stage) up to date; returns {stage: artifact} for the targets.
+
+    A stage's key is computed once its dependencies are done (so input files written upstream, like the curated
+    ambiguous_{a,b}.json read by clean, are hashed as they will be read). Stale stages whose dependencies are done are
+    submitted together, so independent branches (resolver_a / resolver_b, stats_a / stats_b, reference_*) run
+    concurrently. n_jobs=1 runs everything in-process.
+    """
+    stages = configure(overrides)
+    order = topo_order(stages, targets)
+    keys, paths, results = {}, {}, {}
+    pending, running, done = list(order), {}, set()
+    written_path = Path(cache) / "outputs.json"
+    written = json.loads(written_path.read_text(encoding="utf-8")) if written_path.exists() else {}
+
+    def get(name):
+        if name not in results:
+            results[name] = _load(paths[name])
+        return results[name]
+
+    def write_outputs(name, missing_only=False):
+        todo = [(Path(path), write) for path, write in declared_outputs(stages[name]) if not (missing_only and Path(path).exists())]
+        if not todo:
+            return
+        artifact, inputs = get(name), {dep: get(dep) for dep in stages[name]["deps"]}
+        for path, write in todo:
+            if stages[name].get("curated") and path.exists() and _file_digest(path) != written.get(str(path)):
+                # the file differs from what run() last wrote there: keep it unless the new output is identical
+                fresh = path.with_name(f".{path.name}.new")
+                write(fresh, artifact, inputs)
+                same = _file_digest(fresh) == _file_digest(path)
+                fresh.unlink()
+                if not same:
+                    log.warning("%s differs from the last pipeline output (edited by hand?); keeping it, delete it to regenerate", path)
+                    continue
+            else:
+                log.info("Writing %s (stage %s)", path, name)
+                write(path, artifact, inputs)
+            written[str(path)] = _file_digest(path)
+        written_path.parent.mkdir(parents=True, exist_ok=True)
+        written_path.write_text(json.dumps(written, indent=2), encoding="utf-8")
+
+    def finish(name, artifact):
+        results[name] = artifact
+        write_outputs(name)
+        done.add(name)
+
+    def advance(pool):
+        ready = [n for n in pending if all(d in done for d in stages[n]["deps"])]
+        while ready:
+            for name in ready:
+                pending.remove(name)
+                keys[name] = stage_key(name, stages[name], keys)
+                paths[name] = artifact_path(name, keys[name], cache)
+                if name not in force and paths[name].exists():
+                    write_outputs(name, missing_only=True)
+                    done.add(name)
+                    continue
+                inputs = {dep: get(dep) for dep in stages[name]["deps"]}
+                log.info("Running stage %s", name)
+                if pool is None:
+                    finish(name, _execute(name, stages[name]["params"], inputs, paths[name]))
+                else:
+                    running[pool.submit(_execute, name, stages[name]["params"], inputs, paths[name])] = name
+            ready = [n for n in pending if all(d in done for d in stages[n]["deps"])]
+
+    if n_jobs == 1:
+        advance(None)
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            advance(pool)
+            while running:
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    finish(running.pop(fut), fut.result())
+                advance(pool)
+    return {name: get(name) for name in (targets or order)}
+
+
+def load(name, **kwargs):
+    return run([name], **kwargs)[name]
+
+
+def _parse_overrides(items):
+    overrides = {}
+    for item in items or ():
+        key, _, raw = item.partition("=")
+        stage, _, param = key.partition(".")
+        try:
+            value = json.loads(raw)
+        except json.JSONDecodeError:
+            value = raw
+        overrides.setdefault(stage, {})[param] = value
+    return overrides
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the cached Voynich analysis pipeline.")
+    parser.add_argument("targets", nargs="*", help=f"stages to bring up to date (default: all of {', '.join(STAGES)})")
+    parser.add_argument("--force", nargs="*", default=[], help="re-run these stages even if cached")
+    parser.add_argument("--jobs", type=int, default=None, help="worker processes (default: all cores; 1 = in-process)")
+    parser.add_argument("--set", dest="overrides", action="append", metavar="STAGE.PARAM=VALUE", help="override a stage parameter (JSON value)")
+    parser.add_argument("--status", action="store_true", help="only report which stages are cached or stale")
+    args = parser.parse_args(argv)
+    overrides = _parse_overrides(args.overrides)
+    targets = args.targets or None
+    if args.status:
+        for name, state in status(targets, overrides).items():
+            print(f"{name:<20} {state}")
+        return
+    run(targets, force=set(args.force), n_jobs=args.jobs, overrides=overrides)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
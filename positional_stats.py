@@ -0,0 +1,225 @@
+"""
+Position-conditioned word / glyph / edge n-gram statistics over the compiled corpus (`corpus.py`).
+- positions (one code per kept token, computed from group boundaries of the flat stream, no per-line loops):
+  line: initial / medial / final / single word of its line; line_offset, line_offset_end: token offset from the
+  line start / end, clipped at max_offset; paragraph_line: first / middle / last / single line of its paragraph;
+  paragraph_word: first / inner / last / single word of its paragraph
+- features: word, length (in glyphs), glyph (every glyph of the word), first_glyph, last_glyph, start / end (edge
+  n-grams of n glyphs); glyphs come from the corpus glyph inventory (glyphs.py), so ch / sh / cth / iin are single units.
+  For cleaned words the features are read off the stored glyph arrays (glyph_codes / glyph_offsets), raw words are tokenized
+- units: keep lines whose marker unit (second marker char, e.g. "P" in @P0 / +P0 / =Pt) is in `units`; None keeps everything
+- scores: for every feature at once, one-vs-rest chi-square against position (df = positions - 1), binary mutual
+  information in bits, plus lift O/E and standardized residuals per cell
+"""
+import logging
+
+import numpy as np
+from scipy.stats import chi2 as chi2_dist
+
+from corpus import kept_mask, token_ids, token_vocab
+from glyphs import DEFAULT_GLYPHS, decode_keys, expand_csr, tokenize
+
+log = logging.getLogger(__name__)
+
+EDGE_LABELS = ["initial", "medial", "final", "single"]
+POSITION_SCHEMES = ("line", "line_offset", "line_offset_end", "paragraph_line", "paragraph_word")
+FEATURE_KINDS = ("word", "length", "glyph", "first_glyph", "last_glyph", "start", "end")
+
+
+def _bounds(groups):
+    """First/last flags for runs of equal values in a group id array."""
+    n = len(groups)
+    first = np.ones(n, dtype=bool)
+    last = np.ones(n, dtype=bool)
+    if n > 1:
+        first[1:] = groups[1:] != groups[:-1]
+        last[:-1] = first[1:]
+    return first, last
+
+
+def _edge_codes(first, last):
+    codes = np.ones(len(first), dtype=np.int32)
+    codes[first] = 0
+    codes[last] = 2
+    codes[first & last] = 3
+    return codes
+
+
+def _offsets(first, last, from_end=False):
+    idx = np.arange(len(first))
+    if from_end:
+        ends = np.flatnonzero(last)
+        return ends[np.cumsum(first) - 1] - idx
+    starts = np.flatnonzero(first)
+    return idx - starts[np.cumsum(first) - 1]
+
+
+def kept_tokens(corpus, cleaned=True, units="P", currier="all", pages=None, **filters):
+    """Token positions that survive cleaning, the line-unit filter and the page filters."""
+    keep = kept_mask(corpus, cleaned, currier, pages, **filters)
+    if units:
+        line_ok = np.asarray([len(m) > 1 and m[1] in units for m in corpus["line_markers"]], dtype=bool)
+        keep &= line_ok[corpus["line_idx"]]
+    return np.flatnonzero(keep)
+
+
+def position_codes(corpus, positions, scheme="line", max_offset=8):
+    if scheme in ("line", "line_offset", "line_offset_end"):
+        first, last = _bounds(corpus["line_idx"][positions])
+        if scheme == "line":
+            return _edge_codes(first, last), EDGE_LABELS
+        off = np.minimum(_offsets(first, last, from_end=scheme.endswith("_end")), max_offset)
+        return off.astype(np.int32), [str(i) for i in range(max_offset)] + [f"{max_offset}+"]
+    if scheme == "paragraph_word":
+        first, last = _bounds(corpus["para_idx"][positions])
+        return _edge_codes(first, last), EDGE_LABELS
+    if scheme == "paragraph_line":
+        line_first, _ = _bounds(corpus["line_idx"][positions])
+        line_rows = corpus["line_idx"][positions][line_first]
+        first, last = _bounds(corpus["line_para"][line_rows])
+        return _edge_codes(first, last)[np.cumsum(line_first) - 1], EDGE_LABELS
+    raise ValueError(f"Unknown position scheme {scheme!r}; expected one of {POSITION_SCHEMES}")
+
+
+def _type_features(word, kind, n, inventory=DEFAULT_GLYPHS):
+    if kind == "word":
+        return [word]
+    glyphs = tokenize(word, inventory)
+    if kind == "length":
+        return [len(glyphs)]
+    if kind == "glyph":
+        return list(glyphs)
+    if kind == "first_glyph":
+        return [glyphs[0]]
+    if kind == "last_glyph":
+        return [glyphs[-1]]
+    if kind in ("start", "end"):
+        if len(glyphs) < n:
+            return []
+        return ["".join(glyphs[:n] if kind == "start" else glyphs[-n:])]
+    raise ValueError(f"Unknown feature kind {kind!r}; expected one of {FEATURE_KINDS}")
+
+
+def type_feature_table(vocab, kind="word", n=2, inventory=DEFAULT_GLYPHS):
+    """CSR over vocabulary types: features of type t are codes[offsets[t]:offsets[t + 1]]."""
+    inventory = tuple(inventory)
+    lookup, codes, offsets = {}, [], [0]
+    for w in vocab:
+        for f in _type_features(w, kind, n, inventory):
+            codes.append(lookup.setdefault(f, len(lookup)))
+        offsets.append(len(codes))
+    labels = list(lookup)
+    order = sorted(range(len(labels)), key=labels.__getitem__)
+    rank = np.empty(len(labels), dtype=np.int64)
+    rank[order] = np.arange(len(labels))
+    return rank[np.asarray(codes, dtype=np.int64)] if codes else np.zeros(0, dtype=np.int64), np.asarray(offsets, dtype=np.int64), [labels[i] for i in order]
+
+
+def _coded_features(values, ok, label):
+    uniq, inverse = np.unique(values[ok], return_inverse=True)
+    labels, rank = np.unique(np.asarray([label(u) for u in uniq.tolist()]), return_inverse=True)
+    offsets = np.zeros(len(ok) + 1, dtype=np.int64)
+    np.cumsum(ok, out=offsets[1:])
+    return rank.ravel()[inverse.ravel()].astype(np.int64), offsets, labels.tolist()
+
+
+def glyph_feature_table(corpus, kind="glyph", n=2):
+    """type_feature_table over clean_vocab from the corpus glyph arrays, without re-tokenizing."""
+    codes, offsets, glyph_vocab = corpus["glyph_codes"].astype(np.int64), corpus["glyph_offsets"], list(corpus["glyph_vocab"])
+    lengths = np.diff(offsets)
+    if kind == "glyph":
+        return codes, offsets.astype(np.int64), glyph_vocab
+    if kind == "length":
+        return _coded_features(lengths, np.ones(len(lengths), dtype=bool), int)
+    if kind in ("first_glyph", "last_glyph"):
+        ok = lengths > 0
+        at = np.where(ok, offsets[:-1] if kind == "first_glyph" else offsets[1:] - 1, 0)
+        return _coded_features(codes[at] if len(codes) else at, ok, glyph_vocab.__getitem__)
+    if kind in ("start", "end"):
+        ok = lengths >= n
+        first = np.where(ok, offsets[:-1] if kind == "start" else offsets[1:] - n, 0)
+        G = len(glyph_vocab)
+        key = np.zeros(len(first), dtype=np.int64)
+        for k in range(n):
+            key = key * G + (codes[first + k] if len(codes) else 0)
+        return _coded_features(key, ok, lambda u: "".join(decode_keys(np.asarray([u]), n, G, glyph_vocab)[0]))
+    return type_feature_table(corpus["clean_vocab"], kind, n, corpus.get("glyph_inventory", DEFAULT_GLYPHS))
+
+
+def association_scores(table):
+    """One-vs-rest chi-square, p-value and binary MI (bits) for every feature column of a position x feature table."""
+    O = table.astype(float)
+    N = O.sum()
+    r = O.sum(axis=1, keepdims=True)
+    c = O.sum(axis=0, keepdims=True)
+    E = r * c / N
+    with np.errstate(divide="ignore", invalid="ignore"):
+        chi2 = np.nansum((O - E) ** 2 * (1.0 / E + 1.0 / (r - E)), axis=0)
+        chi2[~np.isfinite(chi2)] = 0.0
+        rest, rest_e = r - O, r - E
+        mi = np.nansum(np.where(O > 0, O / N * np.log2(O / E), 0.0), axis=0)
+        mi += np.nansum(np.where(rest > 0, rest / N * np.log2(rest / rest_e), 0.0), axis=0)
+        lift = np.where(E > 0, O / E, 0.0)
+        resid = np.where(E > 0, (O - E) / np.sqrt(E), 0.0)
+        total_chi2 = float(np.nansum(np.where(E > 0, (O - E) ** 2 / E, 0.0)))
+        total_mi = float(np.nansum(np.where(O > 0, O / N * np.log2(O / E), 0.0)))
+    df = max(O.shape[0] - 1, 1)
+    k = min(O.shape)
+    return {
+        "expected": E,
+        "lift": lift,
+        "residual": resid,
+        "chi2": chi2,
+        "p": chi2_dist.sf(chi2, df),
+        "mi": mi,
+        "total_chi2": total_chi2,
+        "total_mi": total_mi,
+        "cramers_v": float(np.sqrt(total_chi2 / (N * (k - 1)))) if N and k > 1 else 0.0,
+    }
+
+
+def positional_table(corpus, position="line", feature="word", n=2, cleaned=True, units="P", currier="all", min_count=5, max_offset=8, pages=None, **filters):
+    """Position x feature contingency table with association scores for all features."""
+    positions = kept_tokens(corpus, cleaned=cleaned, units=units, currier=currier, pages=pages, **filters)
+    pos_codes, pos_labels = position_codes(corpus, positions, position, max_offset=max_offset)
+    if cleaned and "glyph_codes" in corpus:
+        feat_codes, feat_offsets, feat_labels = glyph_feature_table(corpus, feature, n)
+    else:
+        inventory = corpus.get("glyph_inventory", DEFAULT_GLYPHS)
+        feat_codes, feat_offsets, feat_labels = type_feature_table(token_vocab(corpus, cleaned), feature, n, inventory)
+    rows, feats = expand_csr(token_ids(corpus, cleaned)[positions], feat_codes, feat_offsets)
+    k, m = len(pos_labels), len(feat_labels)
+    table = np.bincount(pos_codes[rows].astype(np.int64) * m + feats, minlength=k * m).reshape(k, m)
+    keep = np.flatnonzero(table.sum(axis=0) >= min_count)
+    table = table[:, keep]
+    out = {
+        "position": position,
+        "feature": feature,
+        "positions": pos_labels,
+        "features": [feat_labels[j] for j in keep],
+        "table": table,
+        "tokens": len(positions),
+    }
+    out.update(association_scores(table))
+    log.info("%s x %s: %d tokens, %d features, chi2 %.1f, MI %.4f bits", position, feature, len(positions), len(keep), out["total_chi2"], out["total_mi"])
+    return out
+
+
+def top_features(result, position, k=20, alpha=0.001):
+    """Features most over-represented at one position (by standardized residual), significant at `alpha`."""
+    i = result["positions"].index(position)
+    resid = result["residual"][i]
+    order = np.argsort(resid)[::-1]
+    out = []
+    for j in order:
+        if resid[j] <= 0 or len(out) >= k:
+            break
+        if result["p"][j] > alpha:
+            continue
+        out.append((result["features"][j], int(result["table"][i, j]), float(result["expected"][i, j]), float(result["lift"][i, j])))
+    return out
+
+
+def ranked_features(result, by="chi2", k=20):
+    order = np.argsort(result[by])[::-1][:k]
+    return [(result["features"][j], float(result[by][j]), float(result["p"][j])) for j in order]
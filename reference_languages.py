@@ -117,6 +117,17 @@ def save_cache(data):
         json.dump(data, f, ensure_ascii=False, indent=2)
 
 
+def language_stats_for(lang):
+    tokens = collect_tokens(lang)
+    stats = compute_stats(tokens) | {
+        "language": lang,
+        "max_tokens": max_tokens,
+        "normalization": "lower + accent stripped + letters only",
+    }
+    log.info("Computed stats for %s (%d tokens, %d types)", lang, stats["tokens"], stats["types"])
+    return stats
+
+
 def build_language_stats():
     cache = load_cache()
     changed = False
@@ -124,18 +135,18 @@ def build_language_stats():
     for lang in languages:
         if lang in stats and stats[lang].get("tokens"):
             continue
-        tokens = collect_tokens(lang)
-        stats[lang] = compute_stats(tokens) | {
-            "language": lang,
-            "max_tokens": max_tokens,
-            "normalization": "lower + accent stripped + letters only",
-        }
+        stats[lang] = language_stats_for(lang)
         changed = True
-        log.info("Computed stats for %s (%d tokens, %d types)", lang, stats[lang]["tokens"], stats[lang]["types"])
     if changed:
         save_cache(stats)
     return stats
 
 
-language_stats = build_language_stats()
+def __getattr__(name):
+    # language_stats is built (or read from the JSON cache) on first access
+    if name != "language_stats":
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    global language_stats
+    language_stats = build_language_stats()
+    return language_stats
 
@@ -0,0 +1,93 @@
+"""
+Compiled corpus (`corpus.py`) published once in shared memory for process-pool workers.
+- publish(corpus): every column (token ids, offsets, vocabularies, metadata columns, glyph arrays) is packed into one
+  multiprocessing.shared_memory block; string lists are stored as fixed-width numpy str arrays. Returns the block and a
+  small manifest (column -> dtype, shape, byte offset), which is all that is pickled to workers
+- attach(manifest): read-only numpy views into the block, no copy and no deserialization; string columns come back as
+  numpy str arrays (index / iterate / len like the lists of the compiled corpus)
+- shared_pool(corpus, max_workers): ProcessPoolExecutor whose workers attach on start-up; tasks read the corpus with
+  worker_corpus(). The block is unlinked when the pool exits
+"""
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+ALIGN = 64
+
+_worker_shm = None
+_worker_corpus = None
+
+
+def _columns(corpus):
+    for key, value in corpus.items():
+        if isinstance(value, dict):
+            for sub, col in value.items():
+                yield key, sub, col
+        else:
+            yield key, None, value
+
+
+def _as_array(col):
+    if isinstance(col, np.ndarray):
+        return np.ascontiguousarray(col)
+    return np.asarray(col, dtype=str) if len(col) else np.zeros(0, dtype="<U1")
+
+
+def publish(corpus):
+    """Copy the corpus into one shared-memory block; returns (SharedMemory, manifest). The caller closes and unlinks it."""
+    arrays, manifest, size = [], [], 0
+    for key, sub, col in _columns(corpus):
+        arr = _as_array(col)
+        if arr.dtype.hasobject:
+            raise TypeError(f"Column {key}{'.' + sub if sub else ''} has object dtype and cannot be shared")
+        manifest.append((key, sub, arr.dtype.str, arr.shape, size))
+        arrays.append(arr)
+        size += -(-arr.nbytes // ALIGN) * ALIGN
+    shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    for arr, (_, _, dtype, shape, offset) in zip(arrays, manifest):
+        np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)[...] = arr
+    log.info("Published corpus in shared memory %s (%.1f MB, %d columns)", shm.name, size / 2**20, len(manifest))
+    return shm, {"name": shm.name, "columns": manifest}
+
+
+def attach(manifest, shm=None):
+    """Read-only corpus views over a published block; returns (SharedMemory, corpus). Keep the block open while the views are used."""
+    shm = shm or shared_memory.SharedMemory(name=manifest["name"])
+    corpus = {}
+    for key, sub, dtype, shape, offset in manifest["columns"]:
+        arr = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
+        arr.flags.writeable = False
+        if sub is None:
+            corpus[key] = arr
+        else:
+            corpus.setdefault(key, {})[sub] = arr
+    return shm, corpus
+
+
+def _init_worker(manifest):
+    global _worker_shm, _worker_corpus
+    _worker_shm, _worker_corpus = attach(manifest)
+
+
+def worker_corpus():
+    """The corpus attached by this worker's shared_pool initializer."""
+    if _worker_corpus is None:
+        raise RuntimeError("No shared corpus attached; call this from a task running in shared_pool()")
+    return _worker_corpus
+
+
+@contextmanager
+def shared_pool(corpus, max_workers=None):
+    """ProcessPoolExecutor with `corpus` published once; tasks call worker_corpus() instead of receiving it."""
+    shm, manifest = publish(corpus)
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(manifest,)) as pool:
+            yield pool
+    finally:
+        shm.close()
+        shm.unlink()
@@ -28,8 +28,8 @@ def clean_text_block(text, resolver=None, prob_thresh=0.2, gap_thresh=1.5):
     cleaned = clean_words(toks, resolver=resolver, prob_thresh=prob_thresh, gap_thresh=gap_thresh)
     return " ".join(cleaned)
 
-def group_documents(plain_texts, ordered_pages, groups=None, currier="all", cleaned=False, resolver=None, prob_thresh=0.2, gap_thresh=1.5, exclude_hapax=False):
-    keep = currier_page_filter(currier, ordered_pages=ordered_pages) if groups is None else None
+def group_documents(plain_texts, ordered_pages, groups=None, currier="all", cleaned=False, resolver=None, prob_thresh=0.2, gap_thresh=1.5, exclude_hapax=False, currier_map=None):
+    keep = currier_page_filter(currier, ordered_pages=ordered_pages, currier_map=currier_map) if groups is None else None
     if groups is None:
         selected = [p for p in ordered_pages if (not keep) or (p in keep)]
         labels = selected
@@ -93,12 +93,27 @@ def top_similar(labels, X, n=5):
         out[label] = neigh[:n]
     return out
 
-plain_texts = load_plain_texts()
-ordered_pages, page_to_number = load_page_index()
-labels, docs = group_documents(plain_texts, ordered_pages, currier="all", cleaned=False, exclude_hapax=False)
-vectorizer, tfidf_matrix, vocab = build_tfidf(docs)
-top_terms = top_terms_by_label(labels, tfidf_matrix, vocab, k=20)
-strong_top_terms = strong_terms(labels, tfidf_matrix, vocab, min_weight=0.15, k=20)
-similar_pages = top_similar(labels, tfidf_matrix, n=5)
-log.info("Built TF-IDF for %d docs, vocab %d", tfidf_matrix.shape[0], tfidf_matrix.shape[1])
+_lazy_defaults = ("plain_texts", "ordered_pages", "page_to_number", "labels", "docs", "vectorizer", "tfidf_matrix", "vocab", "top_terms", "strong_top_terms", "similar_pages")
 
+
+def build_defaults():
+    """Page-level TF-IDF over the uncleaned plain texts; binds the module-level defaults (built on first attribute access)."""
+    from pipeline import run
+
+    views = run(["corpus"], n_jobs=1)["corpus"]
+    plain_texts, ordered_pages, page_to_number = views["plain_texts"], views["ordered_pages"], views["page_to_number"]
+    labels, docs = group_documents(plain_texts, ordered_pages, currier="all", cleaned=False, exclude_hapax=False)
+    vectorizer, tfidf_matrix, vocab = build_tfidf(docs)
+    top_terms = top_terms_by_label(labels, tfidf_matrix, vocab, k=20)
+    strong_top_terms = strong_terms(labels, tfidf_matrix, vocab, min_weight=0.15, k=20)
+    similar_pages = top_similar(labels, tfidf_matrix, n=5)
+    log.info("Built TF-IDF for %d docs, vocab %d", tfidf_matrix.shape[0], tfidf_matrix.shape[1])
+    defaults = {k: v for k, v in locals().items() if k in _lazy_defaults}
+    globals().update(defaults)
+    return defaults
+
+
+def __getattr__(name):
+    if name not in _lazy_defaults:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return build_defaults()[name]
@@ -0,0 +1,202 @@
+"""
+Topic modeling on top of the tfidf_keyness documents.
+- documents: `group_documents` (pages / custom groups), `paragraph_documents`, `window_documents`; labels are page ids or (page_id, n) tuples
+- matrices: `build_tfidf` for NMF, `build_counts` (raw term counts, same tokenization) for LDA
+- models: method="nmf" | "lda"; streaming fits use MiniBatchNMF / online LDA via partial_fit over mini-batches
+- restarts: same data, different seeds, fitted in a process pool; stability = mean matched topic cosine across restart pairs
+- cross-tabs: dominant topic per document vs page $-header values ($I illustration, $L Currier language, ...)
+"""
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from sklearn.decomposition import NMF, LatentDirichletAllocation, MiniBatchNMF
+from sklearn.feature_extraction.text import CountVectorizer
+
+from corpus import META_ALIASES, load_pages
+from tfidf_keyness import clean_text_block, resolve_page_id
+from word_stats import currier_page_filter
+
+log = logging.getLogger(__name__)
+
+
+def _selected_pages(ordered_pages, currier="all", pages=None, currier_map=None):
+    keep = currier_page_filter(currier, ordered_pages=ordered_pages, currier_map=currier_map)
+    selected = [p for p in ordered_pages if (not keep) or (p in keep)]
+    if pages is not None:
+        wanted = {resolve_page_id(p, ordered_pages) for p in pages}
+        selected = [p for p in selected if p in wanted]
+    return selected
+
+
+def _clean(doc, cleaned, resolver, prob_thresh, gap_thresh):
+    return clean_text_block(doc, resolver=resolver, prob_thresh=prob_thresh, gap_thresh=gap_thresh) if cleaned else doc
+
+
+def paragraph_documents(plain_texts, ordered_pages, currier="all", pages=None, cleaned=False, resolver=None, prob_thresh=0.2, gap_thresh=1.5, min_tokens=1, currier_map=None):
+    labels, docs = [], []
+    for pid in _selected_pages(ordered_pages, currier, pages, currier_map):
+        for p_idx, para in enumerate(plain_texts[pid].split("\n")):
+            doc = _clean(para, cleaned, resolver, prob_thresh, gap_thresh)
+            if len(doc.split()) >= min_tokens:
+                labels.append((pid, p_idx))
+                docs.append(doc)
+    return labels, docs
+
+
+def window_documents(plain_texts, ordered_pages, size=50, step=None, currier="all", pages=None, cleaned=False, resolver=None, prob_thresh=0.2, gap_thresh=1.5, currier_map=None):
+    """Sliding token windows within each page; label (page_id, start token). The last window of a page may be shorter."""
+    step = step or size
+    labels, docs = [], []
+    for pid in _selected_pages(ordered_pages, currier, pages, currier_map):
+        toks = _clean(plain_texts[pid], cleaned, resolver, prob_thresh, gap_thresh).split()
+        for start in range(0, len(toks), step):
+            labels.append((pid, start))
+            docs.append(" ".join(toks[start:start + size]))
+            if start + size >= len(toks):
+                break
+    return labels, docs
+
+
+def doc_page_ids(labels):
+    return [label[0] if isinstance(label, tuple) else label for label in labels]
+
+
+def build_counts(docs, **vectorizer_kwargs):
+    params = {"token_pattern": r"[^ ]+", "lowercase": False}
+    params.update(vectorizer_kwargs)
+    vec = CountVectorizer(**params)
+    X = vec.fit_transform(docs)
+    vocab = vec.get_feature_names_out()
+    return vec, X, vocab
+
+
+def make_model(method="nmf", n_topics=10, seed=0, streaming=False, batch_size=256, n_docs=None, **model_kwargs):
+    m = method.lower()
+    if m == "nmf":
+        params = {"n_components": n_topics, "random_state": seed, "init": "nndsvda", "max_iter": 500}
+        if streaming:
+            params["batch_size"] = batch_size
+        params.update(model_kwargs)
+        return MiniBatchNMF(**params) if streaming else NMF(**params)
+    if m == "lda":
+        params = {"n_components": n_topics, "random_state": seed, "learning_method": "online", "batch_size": batch_size}
+        if n_docs:
+            params["total_samples"] = n_docs
+        params.update(model_kwargs)
+        return LatentDirichletAllocation(**params)
+    raise ValueError(f"Unknown topic model {method!r}; expected 'nmf' or 'lda'")
+
+
+def fit_topics(X, method="nmf", n_topics=10, seed=0, **model_kwargs):
+    model = make_model(method, n_topics=n_topics, seed=seed, n_docs=X.shape[0], **model_kwargs)
+    doc_topic = model.fit_transform(X)
+    return model, doc_topic
+
+
+def iter_batches(docs, batch_size=256, seed=None):
+    order = np.arange(len(docs)) if seed is None else np.random.default_rng(seed).permutation(len(docs))
+    for start in range(0, len(order), batch_size):
+        yield [docs[i] for i in order[start:start + batch_size]]
+
+
+def fit_streaming(docs, vectorizer, method="nmf", n_topics=10, seed=0, batch_size=256, n_epochs=5, **model_kwargs):
+    """Mini-batch fit: only one batch is vectorized at a time. `vectorizer` must already be fitted (fixed vocabulary)."""
+    model = make_model(method, n_topics=n_topics, seed=seed, streaming=True, batch_size=batch_size, n_docs=len(docs), **model_kwargs)
+    for epoch in range(n_epochs):
+        for batch in iter_batches(docs, batch_size, seed=seed + epoch):
+            model.partial_fit(vectorizer.transform(batch))
+    doc_topic = np.vstack([model.transform(vectorizer.transform(batch)) for batch in iter_batches(docs, batch_size)])
+    return model, doc_topic
+
+
+def _fit_restart(args):
+    X, method, n_topics, seed, model_kwargs = args
+    model, doc_topic = fit_topics(X, method=method, n_topics=n_topics, seed=seed, **model_kwargs)
+    return {"seed": seed, "components": model.components_, "doc_topic": doc_topic}
+
+
+def fit_restarts(X, method="nmf", n_topics=10, seeds=range(8), n_jobs=None, **model_kwargs):
+    """One fit per seed, spread over a process pool (n_jobs=None: all cores; n_jobs=1: in-process)."""
+    if method.lower() == "nmf" and "init" not in model_kwargs:
+        # nndsvda is deterministic, so restarts would all be identical
+        model_kwargs = {"init": "random", **model_kwargs}
+    jobs = [(X, method, n_topics, int(s), model_kwargs) for s in seeds]
+    if n_jobs == 1:
+        runs = [_fit_restart(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            runs = list(pool.map(_fit_restart, jobs))
+    log.info("Fitted %d %s restarts with %d topics", len(runs), method, n_topics)
+    return runs
+
+
+def _unit_rows(components):
+    norms = np.linalg.norm(components, axis=1, keepdims=True)
+    return components / np.where(norms == 0, 1.0, norms)
+
+
+def match_topics(components_a, components_b):
+    """Best one-to-one topic pairing (Hungarian on cosine); returns (b index per a topic, cosine per pair)."""
+    sim = _unit_rows(components_a) @ _unit_rows(components_b).T
+    rows, cols = linear_sum_assignment(-sim)
+    return cols[np.argsort(rows)], sim[rows, cols][np.argsort(rows)]
+
+
+def topic_stability(runs):
+    """Mean matched cosine for every pair of restarts; returns (overall score, pairwise matrix, per-topic score of run 0)."""
+    n = len(runs)
+    pairwise = np.eye(n)
+    per_topic = np.zeros(runs[0]["components"].shape[0]) if n else np.zeros(0)
+    for i, j in combinations(range(n), 2):
+        _, cos = match_topics(runs[i]["components"], runs[j]["components"])
+        pairwise[i, j] = pairwise[j, i] = cos.mean()
+        if i == 0:
+            per_topic += cos
+    if n < 2:
+        return 1.0, pairwise, np.ones_like(per_topic)
+    score = pairwise[np.triu_indices(n, 1)].mean()
+    return float(score), pairwise, per_topic / (n - 1)
+
+
+def representative_run(runs, pairwise=None):
+    """Restart with the highest mean similarity to all others (medoid)."""
+    if pairwise is None:
+        _, pairwise, _ = topic_stability(runs)
+    return runs[int(np.argmax(pairwise.sum(axis=1)))]
+
+
+def top_words(components, vocab, k=10):
+    return [[(vocab[j], float(row[j])) for j in np.argsort(row)[::-1][:k]] for row in components]
+
+
+def load_page_meta(pages=None):
+    pages = pages if pages is not None else load_pages()
+    return {pid: page.get("meta") or {} for pid, page in pages.items()}
+
+
+def topic_crosstab(doc_topic, doc_pages, page_meta, key="I"):
+    """Counts of documents by dominant topic (rows) and page metadata value (cols). key: $-header letter or alias."""
+    key = META_ALIASES.get(key.lower(), key.upper())
+    values = [page_meta.get(pid, {}).get(key, "") for pid in doc_pages]
+    cols = sorted(set(values))
+    col_of = {v: i for i, v in enumerate(cols)}
+    col_idx = np.asarray([col_of[v] for v in values], dtype=np.int64)
+    dominant = np.argmax(doc_topic, axis=1)
+    table = np.zeros((doc_topic.shape[1], len(cols)), dtype=np.int64)
+    np.add.at(table, (dominant, col_idx), 1)
+    return {"key": key, "topics": list(range(doc_topic.shape[1])), "values": cols, "table": table}
+
+
+def crosstab_association(crosstab):
+    """Cramér's V of a topic_crosstab table (0 = independent, 1 = topics determine the metadata value)."""
+    table = crosstab["table"].astype(float)
+    table = table[table.sum(axis=1) > 0][:, table.sum(axis=0) > 0]
+    n = table.sum()
+    if n == 0 or min(table.shape) < 2:
+        return 0.0
+    expected = table.sum(axis=1, keepdims=True) * table.sum(axis=0, keepdims=True) / n
+    chi2 = ((table - expected) ** 2 / expected).sum()
+    return float(np.sqrt(chi2 / (n * (min(table.shape) - 1))))
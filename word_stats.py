@@ -4,6 +4,7 @@ import re
 from pathlib import Path
 from collections import Counter
 from clean import clean_words
+import glyphs as gl
 
 log = logging.getLogger(__name__)
 
@@ -128,7 +129,13 @@ def word_counter(paragraphs_by_page, currier="all", cleaned=False, use_transcrip
 def vocab(counter):
     return set(counter.keys())
 
-def word_length_counts(paragraphs_by_page, currier="all", cleaned=False, use_transcript=USE_CURRIER_FROM_TRANSCRIPT, currier_map=None):
+def glyph_words(paragraphs_by_page, glyphs=True, currier="all", cleaned=False, use_transcript=USE_CURRIER_FROM_TRANSCRIPT, currier_map=None):
+    # glyphs=True or an inventory tuple: the words as integer glyph codes for the glyphs.glyph_* counters
+    return gl.encode_words(iter_words(paragraphs_by_page, currier, cleaned, use_transcript, currier_map), gl.as_inventory(glyphs))
+
+def word_length_counts(paragraphs_by_page, currier="all", cleaned=False, use_transcript=USE_CURRIER_FROM_TRANSCRIPT, currier_map=None, glyphs=None):
+    if glyphs:
+        return gl.glyph_length_counts(glyph_words(paragraphs_by_page, glyphs, currier, cleaned, use_transcript, currier_map))
     return Counter(len(w) for w in iter_words(paragraphs_by_page, currier, cleaned, use_transcript, currier_map))
 
 def iter_word_bigrams(paragraphs_by_page, currier="all", cleaned=False, use_transcript=USE_CURRIER_FROM_TRANSCRIPT, currier_map=None):
@@ -139,12 +146,17 @@ def iter_word_bigrams(paragraphs_by_page, currier="all", cleaned=False, use_tran
 def word_bigram_counter(paragraphs_by_page, currier="all", cleaned=False, use_transcript=USE_CURRIER_FROM_TRANSCRIPT, currier_map=None):
     return Counter(iter_word_bigrams(paragraphs_by_page, currier, cleaned, use_transcript, currier_map))
 
-def iter_char_ngrams(paragraphs_by_page, n=2, currier="all", cleaned=False, use_transcript=USE_CURRIER_FROM_TRANSCRIPT, currier_map=None):
+def iter_char_ngrams(paragraphs_by_page, n=2, currier="all", cleaned=False, use_transcript=USE_CURRIER_FROM_TRANSCRIPT, currier_map=None, glyphs=None):
+    if glyphs:
+        yield from gl.glyph_ngrams(glyph_words(paragraphs_by_page, glyphs, currier, cleaned, use_transcript, currier_map), n)
+        return
     for w in iter_words(paragraphs_by_page, currier, cleaned, use_transcript, currier_map):
         for i in range(len(w) - n + 1):
             yield w[i:i + n]
 
-def char_ngram_counter(paragraphs_by_page, n=2, currier="all", cleaned=False, use_transcript=USE_CURRIER_FROM_TRANSCRIPT, currier_map=None):
+def char_ngram_counter(paragraphs_by_page, n=2, currier="all", cleaned=False, use_transcript=USE_CURRIER_FROM_TRANSCRIPT, currier_map=None, glyphs=None):
+    if glyphs:
+        return gl.glyph_ngram_counts(glyph_words(paragraphs_by_page, glyphs, currier, cleaned, use_transcript, currier_map), n)
     return Counter(iter_char_ngrams(paragraphs_by_page, n, currier, cleaned, use_transcript, currier_map))
 
 def type_token_ratio(paragraphs_by_page, currier="all", cleaned=False, use_transcript=USE_CURRIER_FROM_TRANSCRIPT, currier_map=None):
@@ -159,13 +171,18 @@ def zipf_series(counter, top_n=200):
     return ranks, freqs
 
 
-def iter_word_edge_ngrams(paragraphs_by_page, n=2, currier="all", cleaned=False, position="start"):
+def iter_word_edge_ngrams(paragraphs_by_page, n=2, currier="all", cleaned=False, position="start", glyphs=None, currier_map=None):
     pos = position.lower()
-    for w in iter_words(paragraphs_by_page, currier, cleaned):
+    if glyphs:
+        yield from gl.glyph_ngrams(glyph_words(paragraphs_by_page, glyphs, currier, cleaned, currier_map=currier_map), n, pos)
+        return
+    for w in iter_words(paragraphs_by_page, currier, cleaned, currier_map=currier_map):
         if len(w) < n:
             continue
         yield w[:n] if pos == "start" else w[-n:]
 
 
-def word_edge_ngram_counter(paragraphs_by_page, n=2, currier="all", cleaned=False, position="start"):
-    return Counter(iter_word_edge_ngrams(paragraphs_by_page, n, currier, cleaned, position))
+def word_edge_ngram_counter(paragraphs_by_page, n=2, currier="all", cleaned=False, position="start", glyphs=None, currier_map=None):
+    if glyphs:
+        return gl.glyph_edge_ngram_counts(glyph_words(paragraphs_by_page, glyphs, currier, cleaned, currier_map=currier_map), n, position)
+    return Counter(iter_word_edge_ngrams(paragraphs_by_page, n, currier, cleaned, position, currier_map=currier_map))